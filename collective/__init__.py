@@ -0,0 +1,14 @@
+"""
+Model of collective behaviour based purely on vision.
+
+flock holds the model core, predator its predator rules and visual_field
+the vision-based interaction; vision is the ray casting geometry of the
+visibility tests and render draws a flock with pygame. Only render, replay
+and the drawing helpers of vision import pygame or matplotlib, so headless
+runs and worker processes never load them. python -m collective is the
+command line entry point, see cli.py.
+"""
+
+from .flock import Flock, place_birds
+
+__all__ = ['Flock', 'place_birds']
@@ -0,0 +1,420 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .flock import Flock, place_birds, HEIGHT
+from .metrics import Metrics
+from .spatial import minimum_image
+
+SIZES = (50, 200, 1000, 5000, 20000, 100000)
+AREA_PER_BIRD = 1000 # World area per bird in the scaled worlds of the grid benchmarks
+GRID_RADIUS = 10 # Perception range 40, about 16 birds in range at AREA_PER_BIRD
+COLD_START_BUDGET = 0.5 # Seconds to start Python and import what a headless worker needs
+WORKER_MODULES = ('collective.runner', 'collective.sweep')
+GUI_MODULES = ('pygame', 'matplotlib')
+# Name: Flock arguments of the state layouts compared by --memory
+LAYOUTS = {
+    'float64': {},
+    'float32': {'dtype': 'float32'},
+    'float32_uint16_tails': {'dtype': 'float32', 'tails': 'uint16'},
+    'float32_no_tails': {'dtype': 'float32', 'tails': None},
+}
+
+
+def scaled_world(n):
+    # World size with AREA_PER_BIRD per bird, in the proportions of the simulation window
+    width = int(math.sqrt(n * AREA_PER_BIRD * 1.5))
+    return width, int(width / 1.5)
+
+
+def random_flock(n, seed, scaled=False, **options):
+    """
+    Flock of n birds with reproducible positions and headings.
+
+    With scaled=False the birds start in the box around the centre like in
+    the simulation scripts. With scaled=True they are spread uniformly over a
+    world growing with n, so the density and the number of neighbours per
+    bird stay the same at every size.
+    """
+    random.seed(seed)
+    if scaled:
+        width, height = scaled_world(n)
+        rng = np.random.default_rng(seed)
+        return Flock(rng.uniform(0, width, n), rng.uniform(0, height, n), rng.uniform(0, 2 * np.pi, n),
+                     width=width, height=height, **options)
+    xs, ys = place_birds(n)
+    return Flock(xs, ys, **options)
+
+
+def add_predators(flock, share=0.01):
+    # Turn the last birds into predators, at least one
+    flock.predator[-max(1, int(flock.n * share)):] = True
+    return flock
+
+
+def step_setup(scaled=False, predators=0, **options):
+    # predators is the share of the birds turned into predators
+    def setup(n, seed):
+        flock = random_flock(n, seed, scaled, **options)
+        if predators:
+            add_predators(flock, predators)
+        return flock.step
+    return setup
+
+
+def visibility_setup(mode):
+    def setup(n, seed):
+        from .vision import visibility_matrix
+
+        rng = np.random.default_rng(seed)
+        # Circles like in vision.main, in a box growing with n
+        side = math.sqrt(n) * 30
+        centers = rng.uniform(0, side, (n, 2))
+        radii = rng.integers(4, 8, n).astype(float)
+        return lambda: visibility_matrix(centers, radii, mode)
+    return setup
+
+
+def render_setup(scaled=False, zoom=None):
+    # Drawing only, to a dummy display unless a video driver is set. With scaled=True the world grows with n
+    # and the 900x600 window shows it at the given zoom, the whole world with zoom=None
+    def setup(n, seed):
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from .render import Viewer
+
+        rng = np.random.default_rng(seed)
+        width, height = scaled_world(n) if scaled else (900, 600)
+        flock = Flock(rng.uniform(0, width, n), rng.uniform(0, height, n), rng.uniform(0, 2 * np.pi, n),
+                      rng.uniform(1, 5, n), width=width, height=height)
+        # Grow the tails by moving the birds straight ahead instead of running the model
+        for _ in range(flock.tail_capacity):
+            flock.x = (flock.x + np.cos(flock.angle) * flock.speed) % flock.width
+            flock.y = (flock.y + np.sin(flock.angle) * flock.speed) % flock.height
+            flock.update_tails()
+        viewer = Viewer(flock, fps=0)
+        if zoom is not None:
+            viewer.camera.zoom = zoom
+        return viewer.draw
+    return setup
+
+
+# Name: (setup(n, seed) returning the function to time, description, largest default size)
+BENCHMARKS = {
+    'step': (step_setup(), "Model update, all pairs, like simulation.py", 5000),
+    'step_grid': (step_setup(scaled=True, neighbors='grid', radius=GRID_RADIUS),
+                  "Model update with the cell list, constant density", None),
+    'step_float32': (step_setup(dtype='float32', tails=None), "Model update, all pairs, float32 state", 5000),
+    'step_grid_float32': (step_setup(scaled=True, neighbors='grid', radius=GRID_RADIUS, dtype='float32', tails=None),
+                          "Model update with the cell list, float32 state without tails", None),
+    'barnes_hut': (step_setup(theta=0.5), "Model update, all pairs, far birds summed by groups (theta 0.5)", 20000),
+    'predator': (step_setup(predators=0.01, radius=HEIGHT / 6),
+                 "Model update with predators, like simulation_with_predator.py", 5000),
+    'predator_grid': (step_setup(scaled=True, predators=0.01, neighbors='grid', radius=GRID_RADIUS),
+                      "Predator path with the cell list, constant density", None),
+    'many_predators': (step_setup(scaled=True, predators=0.1, neighbors='grid', radius=GRID_RADIUS),
+                       "Predator path with one predator for every ten birds", None),
+    'vision': (step_setup(scaled=True, neighbors='grid', interaction='vision', radius=GRID_RADIUS),
+               "Vision-based model update with the cell list", None),
+    'occlusion': (step_setup(scaled=True, neighbors='grid', radius=GRID_RADIUS, occlusion=True),
+                  "Model update leaving out the hidden birds, constant density", 20000),
+    'visibility': (visibility_setup('cone'), "vision.visibility_matrix, cone test", 500),
+    'visibility_samples': (visibility_setup('samples'), "vision.visibility_matrix, ray samples", 200),
+    'render': (render_setup(), "Drawing the tails and birds of one frame", None),
+    'render_view': (render_setup(scaled=True, zoom=1), "Drawing a 900x600 view of a world growing with n", None),
+    'render_world': (render_setup(scaled=True), "Drawing a whole world growing with n, a heat map when large", None),
+}
+
+
+def measure(function, warmup=2, min_time=1.0, min_samples=5, max_samples=1000):
+    """
+    Time repeated calls of a function.
+
+    Calls it until both min_time seconds and min_samples calls have passed,
+    at most max_samples times, after warmup untimed calls.
+
+    Returns:
+    dict: Calls per second and latency percentiles in milliseconds.
+    """
+    for _ in range(warmup):
+        function()
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_samples and (len(samples) < min_samples or time.perf_counter() - start < min_time):
+        before = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - before)
+    samples = np.array(samples) * 1000
+    return {
+        'samples': len(samples),
+        'per_second': float(1000 / samples.mean()),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p90_ms': float(np.percentile(samples, 90)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'max_ms': float(samples.max()),
+    }
+
+
+def cold_start(modules=WORKER_MODULES, repeats=5):
+    """
+    Time fresh interpreters importing modules, like a spawned worker process.
+
+    Returns:
+    dict: Median seconds with and without the imports, over repeats runs,
+    and the GUI modules (see GUI_MODULES) the imports loaded.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (f"import sys\nimport {', '.join(modules)}\n"
+            f"print(','.join(name for name in {GUI_MODULES!r} if name in sys.modules))")
+    times, bare = [], []
+    for _ in range(repeats):
+        for command, out in ((code, times), ('pass', bare)):
+            start = time.perf_counter()
+            loaded = subprocess.run([sys.executable, '-c', command], cwd=root, check=True,
+                                    capture_output=True, text=True).stdout.strip()
+            out.append(time.perf_counter() - start)
+    return {
+        'seconds': float(np.median(times)),
+        'interpreter_seconds': float(np.median(bare)),
+        'gui_modules': [name for name in loaded.split(',') if name],
+    }
+
+
+def state_bytes(flock):
+    # Bytes of the arrays a flock keeps between steps
+    return sum(value.nbytes for value in vars(flock).values() if isinstance(value, np.ndarray))
+
+
+def memory(sizes, seed=0, layouts=LAYOUTS):
+    """
+    Measure the memory per bird of the state layouts of a flock.
+
+    Every flock uses the cell list at constant density. The state is what
+    the flock keeps between steps: buffers, tails, flags and the cell list
+    of the last step. The step peak is the most memory numpy allocated
+    during one step on top of it, traced with tracemalloc.
+
+    Parameters:
+    - sizes (list): Numbers of birds.
+    - layouts (dict): Name and Flock arguments of every layout, see LAYOUTS.
+
+    Returns:
+    list: One dict per layout and size with the bytes per bird of the state and of the step peak.
+    """
+    results = []
+    for name, options in layouts.items():
+        for n in sizes:
+            flock = random_flock(n, seed, scaled=True, neighbors='grid', radius=GRID_RADIUS, **options)
+            # The structures built by a step exist from the first one on
+            flock.step()
+            state = state_bytes(flock) + (state_bytes(flock.grid) if flock.grid is not None else 0)
+            tracemalloc.start()
+            flock.step()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result = {'layout': name, 'n': n, 'state_bytes_per_bird': state / n, 'step_bytes_per_bird': peak / n}
+            print(f"{name:>22} n={n:<7} state {result['state_bytes_per_bird']:8.1f} B/bird"
+                  f"  step peak {result['step_bytes_per_bird']:8.1f} B/bird", flush=True)
+            results.append(result)
+    return results
+
+
+def precision(n=200, steps=10000, every=1000, seed=0, **options):
+    """
+    Run the same flock with a float64 and a float32 state and compare the runs.
+
+    Both start from the same float32 state. Single birds are chaotic and
+    end up anywhere after a while at either precision, so the runs are
+    also compared with a float64 control run started from positions moved
+    by the float32 rounding error, and by the order parameters of all
+    three runs (see metrics.py), which float32 should keep.
+
+    Parameters:
+    - n (int): Number of birds.
+    - steps (int): Length of the runs.
+    - every (int): Compare the runs every this many steps.
+    - options: Other arguments of Flock, like neighbors='grid'.
+
+    Returns:
+    list: One dict every every steps with the RMS distance between the
+    positions of the same bird in the float32 and the control run and the
+    float64 run, and the polarization, milling and cohesion of the runs.
+    """
+    compact = random_flock(n, seed, dtype='float32', tails=None, **options)
+    params = dict(compact.params(), dtype='float64')
+    exact = Flock(compact.x, compact.y, compact.angle, compact.speed, **params)
+    # Half a float32 step at the positions, with a random sign
+    rng = np.random.default_rng(seed)
+    ulp_x, ulp_y = np.spacing(compact.x).astype(float), np.spacing(compact.y).astype(float)
+    control = Flock((compact.x + ulp_x * rng.choice([-0.5, 0.5], n)) % compact.width,
+                    (compact.y + ulp_y * rng.choice([-0.5, 0.5], n)) % compact.height,
+                    compact.angle, compact.speed, **params)
+    runs = {'float64': exact, 'float32': compact, 'control': control}
+    for flock in runs.values():
+        flock.attach(Metrics(every=every))
+    results = []
+    for step in range(1, steps + 1):
+        for flock in runs.values():
+            flock.step()
+        if step % every:
+            continue
+        result = {'step': step}
+        for name in ('float32', 'control'):
+            dx = minimum_image(runs[name].x - exact.x, exact.width)
+            dy = minimum_image(runs[name].y - exact.y, exact.height)
+            result[f'rms_distance_{name}'] = float(np.sqrt((dx ** 2 + dy ** 2).mean()))
+        for metric in ('polarization', 'milling', 'cohesion'):
+            for name, flock in runs.items():
+                result[f'{metric}_{name}'] = flock.metrics.last[metric]
+        print(f"step {step:<7} distance rms {result['rms_distance_float32']:9.3g} "
+              f"(control {result['rms_distance_control']:9.3g})  "
+              + "  ".join(f"{metric} " + "/".join(f"{result[f'{metric}_{name}']:.3f}" for name in runs)
+                          for metric in ('polarization', 'milling', 'cohesion')), flush=True)
+        results.append(result)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run_benchmarks(names, sizes, seed=0, max_n=None, **options):
+    """
+    Run the benchmarks at every size up to their largest size.
+
+    Parameters:
+    - names (list): Names of the benchmarks, see BENCHMARKS.
+    - sizes (list): Numbers of birds.
+    - max_n (int): Largest size for every benchmark, instead of their defaults.
+
+    Returns:
+    dict: The environment and one result per benchmark and size.
+    """
+    results = []
+    for name in names:
+        setup, _, largest = BENCHMARKS[name]
+        limit = max_n if max_n is not None else largest
+        for n in sizes:
+            if limit is not None and n > limit:
+                continue
+            try:
+                function = setup(n, seed)
+            except ImportError as error:
+                print(f"{name:>18} skipped: {error}")
+                break
+            result = {'benchmark': name, 'n': n, **measure(function, **options)}
+            print(f"{name:>18} n={n:<7} {result['per_second']:10.1f}/s  p50 {result['p50_ms']:9.3f} ms"
+                  f"  p99 {result['p99_ms']:9.3f} ms", flush=True)
+            results.append(result)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(current, baseline, threshold=0.1):
+    """
+    Compare the median latencies of two benchmark runs.
+
+    Parameters:
+    - threshold (float): Relative slowdown above which a result is a regression.
+
+    Returns:
+    list: (benchmark, n, baseline ms, current ms, ratio, regressed) for every
+    benchmark and size in both runs.
+    """
+    before = {(r['benchmark'], r['n']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        key = (result['benchmark'], result['n'])
+        if key in before:
+            old, new = before[key]['p50_ms'], result['p50_ms']
+            ratio = new / old if old > 0 else math.inf
+            rows.append((*key, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the throughput and latency of the model, vision and rendering.")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Benchmarks to run")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES), help="Numbers of birds")
+    parser.add_argument('--max-n', type=int, help="Largest size for every benchmark, overriding their defaults")
+    parser.add_argument('--min-time', type=float, default=1.0, help="Seconds to time every benchmark and size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="Save the results to this JSON file")
+    parser.add_argument('--compare', help="Flag slowdowns against the results in this JSON file")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="Relative slowdown of the median latency counted as a regression")
+    parser.add_argument('--list', action='store_true', help="List the benchmarks and exit")
+    parser.add_argument('--memory', action='store_true',
+                        help="Only measure the bytes per bird of the float64, float32 and quantized tail layouts")
+    parser.add_argument('--precision', action='store_true',
+                        help="Only compare runs of a float64 and a float32 flock over a long horizon")
+    parser.add_argument('--birds', type=int, default=200, help="Number of birds of --precision")
+    parser.add_argument('--steps', type=int, default=10000, help="Length of the runs of --precision")
+    parser.add_argument('--neighbors', choices=['all', 'grid'], default='all', help="Neighbours of --precision")
+    parser.add_argument('--cold-start', action='store_true',
+                        help=f"Only time the start of a headless worker against the {COLD_START_BUDGET} s budget")
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        result = cold_start()
+        print(f"cold start {result['seconds'] * 1000:.0f} ms, of which {result['interpreter_seconds'] * 1000:.0f} ms "
+              f"for the interpreter, budget {COLD_START_BUDGET * 1000:.0f} ms")
+        if result['gui_modules']:
+            print(f"headless imports loaded {', '.join(result['gui_modules'])}")
+        if result['seconds'] > COLD_START_BUDGET or result['gui_modules']:
+            sys.exit(1)
+        return
+
+    if args.memory or args.precision:
+        if args.memory:
+            results = memory(args.sizes, args.seed)
+        else:
+            options = {'scaled': True, 'radius': GRID_RADIUS} if args.neighbors == 'grid' else {}
+            results = precision(args.birds, args.steps, max(1, args.steps // 10), args.seed,
+                                neighbors=args.neighbors, **options)
+        if args.out:
+            with open(args.out, 'w') as f:
+                json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        return
+
+    if args.list:
+        for name, (_, description, largest) in BENCHMARKS.items():
+            print(f"{name:>18}  {description}" + (f" (up to n={largest})" if largest else ""))
+        return
+
+    results = run_benchmarks(args.only, args.sizes, args.seed, args.max_n, min_time=args.min_time)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for name, n, old, new, ratio, regressed in compare(results, baseline, args.threshold):
+            flag = "SLOWER" if regressed else ""
+            print(f"{name:>18} n={n:<7} {old:9.3f} ms -> {new:9.3f} ms  x{ratio:5.2f} {flag}")
+            regressions += regressed
+        if regressions:
+            print(f"{regressions} regressions above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
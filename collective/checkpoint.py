@@ -0,0 +1,125 @@
+import os
+import random
+
+import numpy as np
+
+from .flock import Flock
+from .trajectory import ALIGN, header_bytes, read_header
+
+MAGIC = b'FLOCKCKP'
+VERSION = 1
+
+
+def rng_state(rng):
+    # State of a random.Random (or the random module) as JSON-compatible lists
+    version, internal, gauss_next = rng.getstate()
+    return [version, list(internal), gauss_next]
+
+
+def set_rng_state(rng, state):
+    version, internal, gauss_next = state
+    rng.setstate((version, tuple(internal), gauss_next))
+
+
+def save(path, flock, step=0, rng=random, meta=None):
+    """
+    Write the complete state of a flock to a checkpoint file.
+
+    The file holds a JSON header with the flock parameters, the step number
+    and the state of rng (None to leave it out), followed by the raw arrays:
+    the state buffer, the predator flags and the tails, oldest point first
+    and cut to the longest tail. The file is written next to path and then
+    renamed, so an interrupted save never leaves a broken checkpoint.
+
+    Parameters:
+    - path (str): Checkpoint file.
+    - flock (Flock): Flock to save.
+    - step (int): Number of steps done so far, returned again by load().
+    - rng (random.Random): Random stream whose state is saved, the random module by default.
+    - meta (dict): Extra JSON-compatible information to keep.
+    """
+    longest = int(flock.tail_length.max()) if flock.n else 0
+    index = (flock.tail_head[:, None] - np.arange(longest)[::-1]) % flock.tail_capacity
+    if flock.n and (flock.tail_head == flock.tail_head[0]).all():
+        # All tails advance together, so whole columns of the ring buffers can be copied
+        tails = np.take(flock.tail_points, index[0], axis=1)
+    else:
+        tails = flock.tail_points[np.arange(flock.n)[:, None], index]
+    arrays = {'state': flock.state, 'predator': flock.predator, 'tail_length': flock.tail_length, 'tails': tails}
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset += array.nbytes + (-array.nbytes % ALIGN)
+    header = {
+        'n': flock.n, 'step': step, 'params': flock.params(), 'arrays': layout,
+        'rng': rng_state(rng) if rng is not None else None, 'meta': meta or {},
+    }
+
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        prefix = header_bytes(header, MAGIC, VERSION)
+        f.write(prefix)
+        for name, array in arrays.items():
+            f.seek(len(prefix) + layout[name]['offset'])
+            np.ascontiguousarray(array).tofile(f)
+        f.truncate(len(prefix) + offset)
+    os.replace(temporary, path)
+
+
+def load(path, rng=random):
+    """
+    Rebuild a flock from a checkpoint file written by save().
+
+    The state of rng is restored too when the checkpoint has one. Stepping
+    the returned flock gives bit for bit the states the saved flock went
+    through after the checkpoint. Attached metrics and profilers are not
+    part of the checkpoint.
+
+    Returns:
+    tuple: The flock, the step number and the header with the meta dict.
+    """
+    header, offset = read_header(path, MAGIC, VERSION, "checkpoint")
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    arrays = {name: np.frombuffer(data, dtype=entry['dtype'], count=int(np.prod(entry['shape'])),
+                                  offset=entry['offset']).reshape(entry['shape'])
+              for name, entry in header['arrays'].items()}
+
+    x, y, angle, speed = arrays['state']
+    flock = Flock(x, y, angle, speed, **header['params'])
+    flock.predator[:] = arrays['predator']
+
+    # The saved tails fill the start of the ring buffers, with the newest point at the head
+    tails = arrays['tails']
+    longest = tails.shape[1]
+    flock.tail_points[:, :longest] = tails
+    flock.tail_head[:] = longest - 1
+    flock.tail_length[:] = arrays['tail_length']
+
+    if rng is not None and header['rng'] is not None:
+        set_rng_state(rng, header['rng'])
+    return flock, header['step'], header
+
+
+class Checkpointer:
+    """
+    Consumer (see runner.stream) saving a checkpoint every `every` steps.
+
+    path may contain {step} to keep every checkpoint, otherwise each one
+    replaces the previous. Steps are counted from start, the step of the
+    checkpoint a run was resumed from.
+    """
+
+    def __init__(self, path, every, rng=random, start=0):
+        self.path = path
+        self.every = every
+        self.rng = rng
+        self.start = start
+
+    def __call__(self, step, flock):
+        if step % self.every == 0:
+            total = self.start + step
+            save(self.path.format(step=total), flock, total, self.rng)
+        return True
@@ -0,0 +1,102 @@
+import argparse
+import importlib
+import random
+import sys
+
+from .flock import Flock, place_birds, ALPHA_0, BETA_0, ALPHA_1, BETA_1, BL, HEIGHT, MAX_SPEED, WIDTH
+from .profiler import Profiler
+from .runner import stream
+
+# Commands run by the main() of a module, imported only when they are used
+COMMANDS = {
+    'run': ('runner', "Run the flock headless as fast as possible"),
+    'replay': ('replay', "Replay a recorded trajectory file"),
+    'sweep': ('sweep', "Sweep the model parameters on a process pool"),
+    'benchmark': ('benchmark', "Measure the throughput of the model, vision and rendering"),
+    'client': ('client', "Watch a run served with run --serve and measure bandwidth and latency"),
+}
+
+
+def simulate(birds=50, seed=None, tail_length=35, radius=1000, predators=0, margin=125, fps=30, profile=False,
+             window=None, **options):
+    """
+    Run the flock in a window until it is closed, like the simulation scripts.
+
+    Parameters:
+    - birds (int): Number of birds.
+    - seed (int): Seed of the starting positions and headings, None for a new run every time.
+    - tail_length (int): Longest drawn tail.
+    - radius (float): Interaction radius.
+    - predators (int): Number of predators, the last birds.
+    - margin (float): Half side of the box around the centre the birds start in.
+    - fps (int): Frames drawn per second, one step per frame.
+    - profile (bool): Show the time spent per phase of a frame from the start, P toggles it.
+    - window (tuple): Window width and height, the world size up to 900x600 by default.
+    - options: Other arguments of Flock, like the model coefficients.
+    """
+    # pygame is only needed, and loaded, once there is something to draw
+    from .render import Viewer
+
+    random.seed(seed)
+    width, height = options.get('width', WIDTH), options.get('height', HEIGHT)
+    xs, ys = place_birds(birds, margin, width, height)
+    flock = Flock(xs, ys, radius=radius, max_tail_length=tail_length, **options)
+    if predators:
+        flock.predator[-predators:] = True
+    flock.profile(Profiler(enabled=profile))
+
+    viewer = Viewer(flock, fps=fps, size=window)
+    for _ in stream(flock, consumers=[viewer]):
+        pass
+    viewer.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in COMMANDS:
+        module = importlib.import_module(f".{COMMANDS[argv[0]][0]}", __package__)
+        return module.main(argv[1:])
+    if argv and argv[0] == 'simulate':
+        argv = argv[1:]
+
+    commands = '\n'.join(f"  {name:<10} {description}" for name, (_, description) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog='python -m collective', formatter_class=argparse.RawDescriptionHelpFormatter,
+        description="Show the flock in a window (the simulate command, the default).",
+        epilog=f"other commands, see python -m collective <command> --help:\n{commands}")
+    parser.add_argument('--birds', type=int, default=50)
+    parser.add_argument('--seed', type=int, help="Seed of the starting positions and headings")
+    parser.add_argument('--predators', type=int, default=0, help="Make the last this many birds predators")
+    parser.add_argument('--radius', type=float,
+                        help="Interaction radius, 1000 or height / 6 with predators like simulation_with_predator.py")
+    parser.add_argument('--tail-length', type=int, help="Longest tail, 35 or 15 with predators")
+    parser.add_argument('--margin', type=float, default=125, help="Half side of the starting box")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--width', type=int, default=WIDTH)
+    parser.add_argument('--height', type=int, default=HEIGHT)
+    parser.add_argument('--window-width', type=int, help="Window width, the world width up to 900 by default")
+    parser.add_argument('--window-height', type=int, help="Window height, the world height up to 600 by default")
+    parser.add_argument('--bl', type=float, default=BL, help="Body length of the birds")
+    parser.add_argument('--alpha-0', type=float, default=ALPHA_0, help="Separation/cohesion acceleration")
+    parser.add_argument('--beta-0', type=float, default=BETA_0, help="Alignment angular velocity")
+    parser.add_argument('--alpha-1', type=float, default=ALPHA_1, help="Spatial gradient acceleration")
+    parser.add_argument('--beta-1', type=float, default=BETA_1, help="Angular gradient angular velocity")
+    parser.add_argument('--max-speed', type=float, default=MAX_SPEED)
+    parser.add_argument('--neighbors', choices=['all', 'grid'], default='all')
+    parser.add_argument('--interaction', choices=['distance', 'vision'], default='distance')
+    parser.add_argument('--occlusion', action='store_true', help="Only interact with the birds in vision")
+    parser.add_argument('--theta', type=float, help="Sum the far birds by groups under this opening angle")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64', help="Precision of the state")
+    parser.add_argument('--tails', choices=['float', 'uint16', 'none'], default='float',
+                        help="Keep the tails in the state precision, quantized to uint16 or not at all")
+    parser.add_argument('--profile', action='store_true', help="Show the time spent per phase of a frame")
+    args = parser.parse_args(argv)
+
+    radius = args.radius if args.radius is not None else (args.height / 6 if args.predators else 1000)
+    tail_length = args.tail_length if args.tail_length is not None else (15 if args.predators else 35)
+    window = (args.window_width or min(args.width, WIDTH), args.window_height or min(args.height, HEIGHT))
+    simulate(args.birds, args.seed, tail_length, radius, args.predators, args.margin, args.fps, args.profile, window,
+             width=args.width, height=args.height, bl=args.bl, neighbors=args.neighbors,
+             interaction=args.interaction, occlusion=args.occlusion, theta=args.theta, alpha_0=args.alpha_0,
+             beta_0=args.beta_0, alpha_1=args.alpha_1, beta_1=args.beta_1, max_speed=args.max_speed,
+             dtype=args.dtype, tails=None if args.tails == 'none' else args.tails)
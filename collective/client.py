@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import base64
+import os
+import socket
+import struct
+import time
+
+import numpy as np
+
+from .server import (FRAME, HOST, KEY, LENGTH, MAGIC, PORT, SEND_BUFFER, FrameDecoder, read_stream_header,
+                     websocket_accept)
+
+
+async def read_message(reader, websocket):
+    # Next message of a stream, None once the server hangs up
+    try:
+        if not websocket:
+            (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+            return await reader.readexactly(length)
+        message = b''
+        while True:
+            first, second = await reader.readexactly(2)
+            length = second & 0x7F
+            if length == 126:
+                (length,) = struct.unpack('!H', await reader.readexactly(2))
+            elif length == 127:
+                (length,) = struct.unpack('!Q', await reader.readexactly(8))
+            payload = await reader.readexactly(length)
+            opcode = first & 0x0F
+            if opcode == 0x8:
+                return None
+            if opcode in (0x0, 0x2):
+                message += payload
+                if first & 0x80:
+                    return message
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return None
+
+
+async def watch(host=HOST, port=PORT, seconds=10.0, websocket=False, delay=0.0, rate=None):
+    """
+    Receive a stream for a while and show its frames, as a viewer on another machine would.
+
+    Frames are read as fast as they come and only the newest is decoded
+    and shown, the others are skipped apart from the keyframes the next
+    delta frames need. Showing a frame takes delay seconds, for a slow
+    viewer, and reading can be capped at rate bytes per second, for a slow
+    network where the server drops frames.
+
+    Parameters:
+    - host, port: Address of the server.
+    - seconds (float): Time to listen for.
+    - websocket (bool): Connect as a WebSocket client instead of over plain TCP.
+    - delay (float): Seconds it takes to show a frame.
+    - rate (float): Bytes per second read at most, None for no limit.
+
+    Returns:
+    dict: Frames received, keyframes among them and steps the server
+    dropped in between, bytes and bytes per second received, frames shown
+    and their latency from encoding to decoding in milliseconds.
+    """
+    # A small receive buffer like the send buffer of the server, a slow viewer gets recent frames
+    connection = socket.create_connection((host, port))
+    connection.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SEND_BUFFER)
+    reader, writer = await asyncio.open_connection(sock=connection, limit=SEND_BUFFER)
+    try:
+        if websocket:
+            key = base64.b64encode(os.urandom(16))
+            writer.write(b'GET / HTTP/1.1\r\nHost: ' + f"{host}:{port}".encode() + b'\r\nUpgrade: websocket\r\n'
+                         b'Connection: Upgrade\r\nSec-WebSocket-Key: ' + key + b'\r\nSec-WebSocket-Version: 13\r\n\r\n')
+            response = await reader.readuntil(b'\r\n\r\n')
+            if websocket_accept(key) not in response:
+                raise ConnectionError(f"{host}:{port} refused the WebSocket handshake")
+        else:
+            writer.write(MAGIC)
+        message = await read_message(reader, websocket)
+        if message is None:
+            raise ConnectionError(f"{host}:{port} closed the stream before its header")
+        decoder = FrameDecoder(read_stream_header(message))
+
+        stats = {'frames': 0, 'keyframes': 0, 'skipped_steps': 0, 'bytes': len(message), 'undecodable': 0}
+        latencies = []
+        newest = []
+        arrived = asyncio.Event()
+
+        async def receive():
+            last_step = None
+            while True:
+                message = await read_message(reader, websocket)
+                if message is None:
+                    return
+                kind, step = FRAME.unpack_from(message)[:2]
+                stats['frames'] += 1
+                stats['bytes'] += len(message)
+                if kind == KEY:
+                    stats['keyframes'] += 1
+                    # Decoded even when it is not shown, for the delta frames after it
+                    decoder.decode(message)
+                if last_step is not None and step > last_step:
+                    stats['skipped_steps'] += step - last_step - 1
+                last_step = step
+                newest[:] = [message]
+                arrived.set()
+                if rate:
+                    await asyncio.sleep(len(message) / rate)
+
+        async def show():
+            while True:
+                await arrived.wait()
+                arrived.clear()
+                frame = decoder.decode(newest.pop())
+                if frame is None:
+                    stats['undecodable'] += 1
+                    continue
+                latencies.append(time.time() - frame[2])
+                if delay:
+                    await asyncio.sleep(delay)
+
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(receive()), asyncio.ensure_future(show())]
+        await asyncio.wait(tasks, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+        elapsed = time.perf_counter() - start
+        for task in tasks:
+            task.cancel()
+    finally:
+        writer.close()
+
+    shown = len(latencies)
+    latencies = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return dict(stats, **{
+        'bytes_per_s': stats['bytes'] / elapsed,
+        'frames_per_s': stats['frames'] / elapsed,
+        'shown': shown,
+        'latency_p50_ms': float(np.percentile(latencies, 50)),
+        'latency_p99_ms': float(np.percentile(latencies, 99)),
+        'latency_max_ms': float(latencies.max()),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Watch a flock stream (run --serve) and measure bandwidth and latency.")
+    parser.add_argument('address', nargs='?', default=f"{HOST}:{PORT}", help="host:port of the server")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Time to listen for")
+    parser.add_argument('--websocket', action='store_true', help="Connect as a WebSocket client")
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds it takes to show a frame, a slow viewer")
+    parser.add_argument('--rate', type=float, help="Read at most this many KiB per second, a slow network")
+    args = parser.parse_args(argv)
+
+    host, _, port = args.address.rpartition(':')
+    rate = args.rate * 1024 if args.rate else None
+    result = asyncio.run(watch(host or HOST, int(port), args.seconds, args.websocket, args.delay, rate))
+    print(f"{result['frames']} frames received ({result['keyframes']} keyframes, {result['frames_per_s']:.1f}/s), "
+          f"{result['skipped_steps']} steps dropped by the server")
+    print(f"{result['bytes']} bytes, {result['bytes_per_s'] / 1024:.1f} KiB/s")
+    print(f"{result['shown']} frames shown, {result['undecodable']} without their keyframe, "
+          f"latency p50 {result['latency_p50_ms']:.2f} ms, p99 {result['latency_p99_ms']:.2f} ms, "
+          f"max {result['latency_max_ms']:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
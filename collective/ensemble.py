@@ -0,0 +1,214 @@
+import random
+
+import numpy as np
+
+from .flock import (normalize_angles, place_birds, BL, DELTA_T, WIDTH, HEIGHT,
+                   ALPHA_0, BETA_0, ALPHA_1, BETA_1, MAX_SPEED)
+from .metrics import NAMES, RunningStats
+
+BLOCK_ELEMENTS = 2 ** 14 # Pairwise entries computed at once, the dozen temporaries of a chunk stay in the CPU caches
+
+
+class Ensemble:
+    """
+    Many independent replicas of a flock advanced together.
+
+    The state of all replicas is held in arrays of shape (replicas, birds)
+    and one step() moves every bird of every replica with the rules of
+    Flock.step() for neighbors='all' and interaction='distance', the
+    pairwise terms of a whole chunk of replicas being computed at once.
+    Replicas never interact.
+
+    Every replica has its own random.Random stream seeded with its seed, from
+    which its starting positions (place_birds) and headings are drawn in the
+    order the simulation scripts draw them from the global stream, so replica
+    k starts like a Flock built after random.seed(seeds[k]).
+
+    The order parameters of every replica (see metrics.order_parameters) are
+    aggregated online every `every` steps; tails are not kept.
+    """
+
+    def __init__(self, replicas, num_birds, seeds=None, margin=125, speed=2, radius=1000, bl=BL,
+                 width=WIDTH, height=HEIGHT, predators=0, alpha_0=ALPHA_0, beta_0=BETA_0,
+                 alpha_1=ALPHA_1, beta_1=BETA_1, max_speed=MAX_SPEED, every=1):
+        self.seeds = list(range(replicas)) if seeds is None else list(seeds)
+        if len(self.seeds) != replicas:
+            raise ValueError(f"Expected {replicas} seeds, got {len(self.seeds)}")
+        self.m = replicas
+        self.n = num_birds
+        self.rngs = [random.Random(seed) for seed in self.seeds]
+        self.x = np.empty((replicas, num_birds))
+        self.y = np.empty((replicas, num_birds))
+        self.angle = np.empty((replicas, num_birds))
+        for k, rng in enumerate(self.rngs):
+            self.x[k], self.y[k] = place_birds(num_birds, margin, width, height, rng)
+            self.angle[k] = [rng.uniform(0, 2 * np.pi) for _ in range(num_birds)]
+        self.speed = np.full((replicas, num_birds), float(speed))
+        self.predator = np.zeros((replicas, num_birds), dtype=bool)
+        if predators:
+            self.predator[:, -predators:] = True
+        self.radius = radius
+        self.bl = bl
+        self.width = width
+        self.height = height
+        self.alpha_0 = alpha_0
+        self.beta_0 = beta_0
+        self.alpha_1 = alpha_1
+        self.beta_1 = beta_1
+        self.max_speed = max_speed
+
+        self.every = every
+        self.steps = 0
+        self.neighbor_stats = np.zeros((2, replicas, num_birds))
+        self.last = {}
+        self.stats = {name: RunningStats() for name in NAMES}
+        self.chunk = max(1, BLOCK_ELEMENTS // max(num_birds * num_birds, 1))
+
+    def forces(self, rows, stats=True):
+        """
+        Changes of speed and heading of every bird of a chunk of replicas.
+
+        The nearest-neighbour distances and contacts of the order parameters
+        are only recorded with stats=True.
+
+        Returns:
+        tuple: Arrays dspeed, dangle, the speed cap and the turning factor, shape (chunk, birds).
+        """
+        x, y, angle, speed = self.x[rows], self.y[rows], self.angle[rows], self.speed[rows]
+        n = self.n
+        diagonal = np.arange(n)
+
+        # [k, i, j] is the vector from bird i to bird j of replica k
+        dx = x[:, None, :] - x[:, :, None]
+        dy = y[:, None, :] - y[:, :, None]
+        # Cheaper forms of the np.hypot and % of Flock.flock_forces, equal up to rounding
+        dist = np.sqrt(dx * dx + dy * dy)
+        dist[:, diagonal, diagonal] = np.inf # A bird is not its own neighbour
+        angle_diffs = np.arctan2(dy, dx)
+        angle_diffs -= (angle % (2 * np.pi))[:, :, None]
+        angle_diffs += (2 * np.pi) * (angle_diffs < 0)
+        angle_diffs += (2 * np.pi) * (angle_diffs < 0)
+        angle_diffs[:, diagonal, diagonal] = 0
+        wrapped = angle_diffs - (2 * np.pi) * (angle_diffs > np.pi)
+        with np.errstate(divide='ignore'):
+            inv_dist = 1 / dist
+        inv_dist[np.isinf(inv_dist)] = 0 # Birds at the same position
+
+        if stats:
+            self.neighbor_stats[0, rows] = dist.min(axis=2)
+            self.neighbor_stats[1, rows] = (dist < self.bl).sum(axis=2)
+
+        # Separate from birds that are too close, cohere towards birds at an ideal distance
+        separate = dist < self.radius * 2
+        cohere = ~separate & (dist < self.radius * 4)
+        weight = (cohere.astype(float) - separate) * inv_dist
+
+        dspeed = self.alpha_0 * weight.sum(axis=2)
+        dangle = self.beta_0 * (weight * wrapped).sum(axis=2)
+
+        # Spatial and angular gradients based on the average speed and angle of the others
+        count = max(n - 1, 1)
+        avg_speed = (speed.sum(axis=1, keepdims=True) - speed) / count
+        avg_angle = angle_diffs.sum(axis=2) / count
+        dspeed += self.alpha_1 * (avg_speed - speed)
+        dangle += self.beta_1 * (avg_angle - angle)
+
+        max_speed = np.full(dspeed.shape, float(self.max_speed))
+        turn = np.ones(dspeed.shape)
+        predator = self.predator[rows]
+        if predator.any():
+            # Prey flee the nearest predator within radius
+            close = (dist < self.radius) & predator[:, None, :] & ~predator[:, :, None]
+            fleeing = close.any(axis=2)
+            hunter = np.where(close, dist, np.inf).argmin(axis=2)
+            k, i = np.nonzero(fleeing)
+            j = hunter[k, i]
+            dangle[k, i] = np.arctan2(-dy[k, i, j], -dx[k, i, j]) - angle[k, i]
+            dspeed[k, i] = self.max_speed
+            max_speed[k, i] = self.max_speed + 1
+
+            # Predators head for the centroid of the birds within 2 * radius, or the first bird
+            k, i = np.nonzero(predator)
+            nearby = dist[k, i] < 2 * self.radius
+            count = nearby.sum(axis=1)
+            to_x = np.where(nearby, dx[k, i], 0).sum(axis=1) / np.maximum(count, 1)
+            to_y = np.where(nearby, dy[k, i], 0).sum(axis=1) / np.maximum(count, 1)
+            alone = count == 0
+            to_x[alone], to_y[alone] = dx[k[alone], i[alone], 0], dy[k[alone], i[alone], 0]
+            dangle[k, i] = self.beta_1 * (np.arctan2(to_y, to_x) - angle[k, i])
+            dspeed[k, i] = self.alpha_1 * (self.max_speed + 3 - speed[k, i])
+            max_speed[k, i] = self.max_speed + 3
+            turn[k, i] = 4 # Predator turns faster
+        return dspeed, dangle, max_speed, turn
+
+    def step(self):
+        # Forces of every chunk of replicas first, then every bird moves at once, as Flock.step
+        # The neighbour statistics are only needed in the steps the order parameters are taken
+        stats = (self.steps + 1) % self.every == 0
+        changes = [self.forces(slice(start, min(start + self.chunk, self.m)), stats)
+                   for start in range(0, self.m, self.chunk)]
+        dspeed, dangle, max_speed, turn = (np.concatenate(parts) for parts in zip(*changes))
+
+        self.speed = np.minimum(self.speed + dspeed * DELTA_T, max_speed)
+        self.angle = self.angle + dangle * DELTA_T * turn
+        self.angle += normalize_angles(dangle * DELTA_T)
+        self.x = (self.x + np.cos(self.angle) * self.speed) % self.width
+        self.y = (self.y + np.sin(self.angle) * self.speed) % self.height
+
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.last = self.order_parameters()
+            for name, values in self.last.items():
+                self.stats[name].add(values)
+
+    def order_parameters(self):
+        """
+        Order parameters of every replica, as metrics.order_parameters.
+
+        Returns:
+        dict: Metric name to an array with one value per replica.
+        """
+        heading_x, heading_y = np.cos(self.angle), np.sin(self.angle)
+        cx, cy = self.centroid()
+        rx = self.x - cx[:, None]
+        ry = self.y - cy[:, None]
+        rx -= self.width * np.round(rx / self.width)
+        ry -= self.height * np.round(ry / self.height)
+        distance = np.hypot(rx, ry)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rotation = np.where(distance > 0, (rx * heading_y - ry * heading_x) / distance, 0)
+
+        nearest, contacts = self.neighbor_stats
+        return {
+            'polarization': np.hypot(heading_x.mean(axis=1), heading_y.mean(axis=1)),
+            'milling': np.abs(rotation.mean(axis=1)),
+            'nn_distance': nearest.mean(axis=1),
+            'cohesion': distance.mean(axis=1),
+            'collisions': contacts.sum(axis=1) / 2,
+        }
+
+    def centroid(self):
+        # Circular mean of the positions of every replica, see metrics.centroid
+        center = []
+        for values, size in ((self.x, self.width), (self.y, self.height)):
+            phase = values / size * 2 * np.pi
+            mean = np.arctan2(np.sin(phase).mean(axis=1), np.cos(phase).mean(axis=1))
+            center.append(mean % (2 * np.pi) / (2 * np.pi) * size)
+        return center
+
+    def summary(self):
+        """
+        Returns:
+        list: One dict per replica with its seed and the mean, standard
+        deviation and last value of every metric, like Metrics.summary.
+        """
+        rows = []
+        for k, seed in enumerate(self.seeds):
+            row = {'seed': seed}
+            for name in NAMES:
+                stats = self.stats[name]
+                row[f'{name}_mean'] = float(stats.mean[k]) if stats.count else np.nan
+                row[f'{name}_std'] = float(np.atleast_1d(stats.std)[k]) if stats.count else np.nan
+                row[f'{name}_last'] = float(self.last[name][k]) if self.last else np.nan
+            rows.append(row)
+        return rows
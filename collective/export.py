@@ -0,0 +1,280 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pygame
+
+from .render import Camera, Scene, heat_colors, screen_size, BG_COLOR, BIRD_COLOR, PREDATOR_COLOR, TAIL_COLOR
+
+VIDEO_FORMATS = ('.mp4', '.mkv', '.webm', '.mov') # Written by ffmpeg
+QUEUE_SIZE = 8 # Frames drawn ahead of the encoders at most, bounds the memory of an export
+MAX_WORKERS = 4 # Encoder threads of the formats encoding every frame on its own
+
+
+def pixel_layout(surface):
+    """
+    Byte order of the pixels of a 32-bit surface.
+
+    Returns:
+    str: Channel of every byte, like 'BGRX', X for the unused byte.
+    """
+    channels = dict(zip(surface.get_shifts()[:3], 'RGB'))
+    return ''.join(channels.get(8 * byte, 'X') for byte in range(4))
+
+
+class PngWriter:
+    """
+    Numbered PNG files in a directory, written by pygame in any order.
+    """
+
+    ordered = False
+    parallel = True
+
+    def __init__(self, path, size, fps):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def encode(self, index, surface):
+        pygame.image.save(surface, os.path.join(self.path, f"frame_{index:06d}.png"))
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        pass
+
+
+class GifWriter:
+    """
+    Animated GIF streamed frame by frame with Pillow.
+
+    All frames are quantized to one palette of the drawing colours: the
+    background, the birds, the gradient of the tails and the heat map.
+    """
+
+    ordered = True
+    parallel = True
+
+    def __init__(self, path, size, fps):
+        from PIL import GifImagePlugin, Image
+
+        self.Image = Image
+        self.getdata = GifImagePlugin.getdata
+        self.duration = round(1000 / fps)
+        fade = np.linspace(0, 1, 125)[:, None]
+        colors = np.vstack([[BG_COLOR, BIRD_COLOR, PREDATOR_COLOR],
+                            (1 - fade) * (200, 200, 200) + fade * np.array(TAIL_COLOR),
+                            heat_colors(128)]).astype(np.uint8)
+        self.palette = Image.new('P', size)
+        self.palette.putpalette(colors.ravel().tolist())
+        header, _ = GifImagePlugin.getheader(self.palette.copy(), info={'loop': 0, 'optimize': False})
+        self.file = open(path, 'wb')
+        self.file.write(b''.join(header))
+
+    def encode(self, index, surface):
+        # The surface pixels are read in place, the quantized frame is a copy
+        frame = self.Image.frombuffer('RGB', surface.get_size(), surface.get_buffer(), 'raw',
+                                      pixel_layout(surface), surface.get_pitch(), 1)
+        frame = frame.quantize(palette=self.palette, dither=0)
+        return b''.join(self.getdata(frame, duration=self.duration))
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.write(b';')
+        self.file.close()
+
+
+class FfmpegWriter:
+    """
+    Video (or GIF) encoded by a local ffmpeg process, fed the raw pixels of the frames.
+    """
+
+    ordered = True
+    parallel = False # One process fed in order, started by the first frame
+
+    def __init__(self, path, size, fps):
+        self.ffmpeg = shutil.which('ffmpeg')
+        if self.ffmpeg is None:
+            raise RuntimeError(f"Writing {path} needs ffmpeg on the PATH, PNG frames only need pygame")
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.process = None
+
+    def start(self, surface):
+        # The pixel format is only known from the first surface
+        pixel_format = pixel_layout(surface).lower().replace('x', '0')
+        command = [self.ffmpeg, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', pixel_format,
+                   '-s', f"{self.size[0]}x{self.size[1]}", '-r', str(self.fps), '-i', '-']
+        if not self.path.endswith('.gif'):
+            # Most players need even sizes and 4:2:0 chroma
+            command += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p']
+        self.process = subprocess.Popen(command + [self.path], stdin=subprocess.PIPE)
+
+    def encode(self, index, surface):
+        # Handed to ffmpeg as they are in write()
+        if self.process is None:
+            self.start(surface)
+        return surface.get_buffer()
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdin.close()
+            if self.process.wait():
+                raise RuntimeError(f"ffmpeg failed writing {self.path}")
+
+
+def writer_for(path):
+    # Writer class of an output path, from its extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension in VIDEO_FORMATS:
+        return FfmpegWriter
+    if extension == '.gif':
+        try:
+            import PIL # noqa: F401
+        except ImportError:
+            return FfmpegWriter
+        return GifWriter
+    if extension:
+        raise ValueError(f"Unknown export format {extension}, use a directory for PNG frames, .gif or a video")
+    return PngWriter
+
+
+class Exporter:
+    """
+    Consumer (see runner.stream) drawing the flock offscreen and writing the frames to a file.
+
+    Frames are drawn on the simulation thread into one of a fixed set of
+    surfaces, which is handed as it is to the encoder threads through a
+    bounded queue and comes back once encoded. The simulation only waits
+    when all surfaces are waiting to be encoded, so an export runs as fast
+    as the simulation and the encoders allow, and at most queue_size frames
+    are held in memory.
+
+    Frames show the flock through a camera on the whole world (see
+    render.Scene), of the world size up to the size of the simulation
+    window by default.
+
+    The format follows the path: a directory of PNG files for a path
+    without extension, a GIF with Pillow (or ffmpeg without Pillow), or a
+    video with a local ffmpeg for .mp4, .mkv, .webm and .mov.
+    """
+
+    def __init__(self, path, flock, every=1, fps=30, workers=None, queue_size=QUEUE_SIZE, size=None):
+        self.path = path
+        self.every = every
+        size = screen_size(flock) if size is None else size
+        self.writer = writer_for(path)(path, size, fps)
+        if workers is None:
+            workers = min(os.cpu_count() or 1, MAX_WORKERS) if self.writer.parallel else 1
+        self.scene = Scene(flock, Camera((flock.width, flock.height), size))
+
+        self.free = queue.Queue()
+        for _ in range(queue_size):
+            self.free.put(pygame.Surface(size, 0, 32))
+        self.frames = queue.Queue()
+        self.next_frame = 0 # Next frame to write, for the ordered formats
+        self.turn = threading.Condition()
+        self.error = None
+        self.reported = False # The error was raised in the simulation already
+        self.count = 0
+        self.waited = 0.0 # Seconds the simulation waited for a free surface
+        self.threads = [threading.Thread(target=self.work, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __call__(self, step, flock):
+        if step % self.every:
+            return True
+        if self.error is not None:
+            self.reported = True
+            raise self.error
+        start = time.perf_counter()
+        surface = self.free.get()
+        self.waited += time.perf_counter() - start
+        self.scene.draw(surface)
+        self.frames.put((self.count, surface))
+        self.count += 1
+        return True
+
+    def work(self):
+        while True:
+            item = self.frames.get()
+            if item is None:
+                return
+            index, surface = item
+            data = None
+            try:
+                if self.error is None:
+                    data = self.writer.encode(index, surface)
+                with self.turn:
+                    # Frames of an ordered format are written one after the other
+                    while self.writer.ordered and self.next_frame != index:
+                        self.turn.wait()
+                    if self.error is None:
+                        self.writer.write(data)
+                    self.next_frame = index + 1
+                    self.turn.notify_all()
+            except Exception as error:
+                self.error = error
+                with self.turn:
+                    self.next_frame = index + 1
+                    self.turn.notify_all()
+            self.free.put(surface)
+
+    def close(self):
+        # Wait for the encoders to finish the queued frames
+        for _ in self.threads:
+            self.frames.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.error is None:
+            self.writer.close()
+        elif not self.reported:
+            raise self.error
+
+    def summary(self):
+        """
+        Returns:
+        dict: Frames written and the seconds the simulation waited for the encoders.
+        """
+        return {'frames': self.count, 'waited': self.waited}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_trajectory(path, out, every=1, fps=30, start=0, stop=None, workers=None):
+    """
+    Write the frames of a recorded trajectory file (see trajectory.py) without showing them.
+
+    Returns:
+    dict: Summary of the export, see Exporter.summary.
+    """
+    from .flock import Flock
+    from .trajectory import Trajectory
+
+    trajectory = Trajectory(path)
+    n = trajectory.n
+    flock = Flock(np.zeros(n), np.zeros(n), np.zeros(n), **trajectory.params)
+    stop = len(trajectory) if stop is None else min(stop, len(trajectory))
+    with Exporter(out, flock, every, fps, workers) as exporter:
+        # The tails grow from the frames before the first one
+        for index in range(max(0, start - 2 * flock.tail_capacity), stop):
+            trajectory.load(flock, index)
+            flock.update_tails()
+            if index >= start:
+                exporter(index - start, flock)
+    return exporter.summary()
@@ -0,0 +1,676 @@
+import math
+import random
+
+import numpy as np
+
+from .predator import index_predators, predator_forces
+from .quadtree import QuadTree
+from .spatial import CellList, minimum_image
+from .visibility import visible_pairs
+from .visual_field import project, field_forces
+
+# Constants
+WIDTH, HEIGHT = 900, 600
+BL = 5  # Body length/diameter of each bird
+DELTA_T = 0.1  # Time step for updating positions
+
+ALPHA_0 = 0.2 # Acceleration coefficient for separation/cohesion
+BETA_0 = 0.001 # Angular velocity coefficient for alignment
+ALPHA_1 = 0.08 # Acceleration coefficient for adapting to spatial gradient velocity
+BETA_1 = 0.08 # Angular velocity coefficient for adapting to the angular gradient
+MAX_SPEED = 5
+GAMMA = 0.1 # Relaxation rate towards the preferred speed in the vision-based model
+V0 = 2 # Preferred speed in the vision-based model
+
+FIELDS = ('x', 'y', 'angle', 'speed') # Rows of the state buffers
+
+BLOCK_SIZE = 1024 # Rows of the pairwise matrices computed at once, bounds memory to BLOCK_SIZE * N
+TAIL_LEVELS = 2 ** 16 # Steps across the world of the tail points stored as uint16
+
+
+def normalize_angles(angle):
+    # Vectorized Bird.normalize_angle, maps to (-pi, pi]
+    return angle - 2 * np.pi * np.ceil((angle - np.pi) / (2 * np.pi))
+
+
+def place_birds(num_birds, margin=125, width=WIDTH, height=HEIGHT, rng=random):
+    """
+    Sample distinct starting positions in a square box around the centre of the world.
+
+    The positions are drawn from rng, a random.Random, or the global stream of
+    the random module by default.
+
+    Returns:
+    tuple: Lists of x and y coordinates.
+    """
+    center_x, center_y = width // 2, height // 2
+    xs, ys = [], []
+    taken = set()
+    for _ in range(num_birds):
+        while True:
+            new_x = center_x + rng.uniform(-margin, margin)
+            new_y = center_y + rng.uniform(-margin, margin)
+
+            # Check if the new position is not already taken
+            if (new_x, new_y) not in taken:
+                break
+
+        taken.add((new_x, new_y))
+        xs.append(new_x)
+        ys.append(new_y)
+    return xs, ys
+
+
+class Flock:
+    """
+    Struct-of-arrays state of all birds, advanced together by step().
+
+    The state is double buffered: every bird reads the state of the previous
+    step from the front buffer and its new state goes to the back buffer, so
+    the result does not depend on the order of the birds and any partition
+    of the birds can be updated independently (see parallel.py). With
+    sequential=True birds are instead moved in place one after the other, each
+    seeing the already moved birds before it, like the original main loop.
+
+    With neighbors='all' every bird interacts with every other bird as in the
+    original model. With neighbors='grid' interactions are limited to the
+    perception range (radius * 4), found with a periodic cell list, distances
+    use the minimum image of the wrap-around world and the angular gradient
+    averages over the perceived birds only. The step cost is then close to
+    linear in the number of birds.
+
+    With interaction='vision' the separation/cohesion and gradient rules are
+    replaced by the vision-based model of the paper, driven by the visual
+    field each bird projects from its neighbours (see visual_field.py).
+
+    With occlusion=True the distance-based rules only sum over the
+    neighbours a bird sees, those not hidden behind closer neighbours,
+    checked again at every step (see visibility.py).
+
+    With theta set the distance-based rules are summed Barnes-Hut style:
+    birds are grouped in a quadtree built every step and a group far enough
+    away, seen under an angle below theta, counts as that many birds at its
+    centre of mass (see quadtree.py). The step cost then grows close to
+    N log N even when every bird interacts with every other, and
+    approximation_error() compares the sums with the exact ones.
+
+    Any number of birds can be predators (the predator flags). Prey flee
+    the nearest predator within radius and predators head for the centroid
+    of the birds around them, both found with cell lists indexed once per
+    step (see predator.py).
+
+    The model coefficients default to the module constants and can be set
+    per flock, e.g. for parameter sweeps.
+
+    For very large flocks the state can be kept in float32 with
+    dtype='float32', and the tails as uint16 steps of the world with
+    tails='uint16' (a 900 px wide world in steps of 0.014 px) or not at all
+    with tails=None. The default float64 state with float tails takes 64
+    bytes plus 16 per tail point per bird, float32 without tails 32 bytes,
+    see benchmark.py --memory and --precision for the cost in accuracy.
+
+    The body length and radius are one scalar for the whole flock, with no
+    per-bird override: the cell size, the contact and occlusion tests, the
+    predator ranges and the drawing all assume one value for all birds.
+    """
+
+    def __init__(self, x, y, angle=None, speed=2, radius=1000, bl=BL, max_tail_length=35,
+                 width=WIDTH, height=HEIGHT, neighbors='all', interaction='distance', sequential=False,
+                 occlusion=False, theta=None, alpha_0=ALPHA_0, beta_0=BETA_0, alpha_1=ALPHA_1, beta_1=BETA_1,
+                 max_speed=MAX_SPEED, dtype='float64', tails='float'):
+        if np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError(f"The state is float32 or float64, got {dtype}")
+        if tails not in ('float', 'uint16', None):
+            raise ValueError(f"Unknown tails storage: {tails}")
+        if neighbors not in ('all', 'grid'):
+            raise ValueError(f"Unknown neighbors mode: {neighbors}")
+        if interaction not in ('distance', 'vision'):
+            raise ValueError(f"Unknown interaction: {interaction}")
+        if sequential and neighbors == 'grid':
+            raise ValueError("Sequential updates need neighbors='all', the cell list is built once per step")
+        if occlusion and (sequential or interaction == 'vision'):
+            raise ValueError("Occlusion needs interaction='distance' and updates of all birds at once")
+        if theta is not None and not 0 <= theta < 1:
+            raise ValueError(f"The opening angle theta must be in [0, 1), got {theta}")
+        if theta is not None and (sequential or occlusion or interaction == 'vision'):
+            raise ValueError("The Barnes-Hut sums need interaction='distance' without occlusion "
+                             "and updates of all birds at once")
+        self.n = len(x)
+        self.buffers = np.zeros((2, len(FIELDS), self.n), dtype=dtype)
+        self.front = 0
+        self.x = x
+        self.y = y
+        if angle is None:
+            angle = [random.uniform(0, 2 * math.pi) for _ in range(self.n)]
+        self.angle = angle
+        self.speed = speed
+        self.predator = np.zeros(self.n, dtype=bool)
+        self.radius = radius
+        self.bl = bl
+        self.max_tail_length = max_tail_length
+        self.width = width
+        self.height = height
+        # Ring buffers of the last tail points, only the drawn ones (max_tail_length segments) are kept,
+        # in the state dtype, as steps of the world in uint16 with tails='uint16' or not at all with tails=None
+        self.tails = tails
+        self.tail_capacity = max_tail_length + 1 if tails is not None else 0
+        self.tail_points = np.zeros((self.n, self.tail_capacity, 2), dtype=np.uint16 if tails == 'uint16' else dtype)
+        # The compact layouts also keep the ring positions in int16
+        index_dtype = int if tails == 'float' else np.int16
+        self.tail_head = np.full(self.n, -1, dtype=index_dtype)
+        self.tail_length = np.zeros(self.n, dtype=index_dtype)
+        self.neighbors = neighbors
+        self.interaction = interaction
+        self.sequential = sequential
+        self.occlusion = occlusion
+        self.theta = theta
+        self.tree = None
+        self.alpha_0 = alpha_0
+        self.beta_0 = beta_0
+        self.alpha_1 = alpha_1
+        self.beta_1 = beta_1
+        self.max_speed = max_speed
+        self.grid = None
+        self.hunters = np.empty(0, dtype=int)
+        self.hunter_grid = None
+        self.metrics = None
+        self.neighbor_stats = None
+        self.profiler = None
+
+    @property
+    def x(self):
+        return self.buffers[self.front, 0]
+
+    @x.setter
+    def x(self, value):
+        self.buffers[self.front, 0] = value
+
+    @property
+    def y(self):
+        return self.buffers[self.front, 1]
+
+    @y.setter
+    def y(self, value):
+        self.buffers[self.front, 1] = value
+
+    @property
+    def angle(self):
+        return self.buffers[self.front, 2]
+
+    @angle.setter
+    def angle(self, value):
+        self.buffers[self.front, 2] = value
+
+    @property
+    def speed(self):
+        return self.buffers[self.front, 3]
+
+    @speed.setter
+    def speed(self, value):
+        self.buffers[self.front, 3] = value
+
+    @property
+    def state(self):
+        # Current x, y, angle and speed of every bird, shape (4, n)
+        return self.buffers[self.front]
+
+    @property
+    def back(self):
+        # Buffer the next state is written to
+        return self.buffers[1 - self.front]
+
+    def swap(self):
+        self.front = 1 - self.front
+
+    def params(self):
+        # Constructor arguments besides the state, to build an equivalent flock
+        return {
+            'radius': self.radius, 'bl': self.bl, 'max_tail_length': self.max_tail_length,
+            'width': self.width, 'height': self.height, 'neighbors': self.neighbors,
+            'interaction': self.interaction, 'sequential': self.sequential, 'occlusion': self.occlusion,
+            'theta': self.theta, 'alpha_0': self.alpha_0, 'beta_0': self.beta_0, 'alpha_1': self.alpha_1,
+            'beta_1': self.beta_1, 'max_speed': self.max_speed, 'dtype': self.buffers.dtype.name, 'tails': self.tails,
+        }
+
+    def attach(self, metrics):
+        """
+        Update metrics (see metrics.Metrics) after every step.
+
+        The step then also records the nearest-neighbour distance and the
+        number of touching bodies of every bird in neighbor_stats, from the
+        distances it computes anyway.
+        """
+        self.metrics = metrics
+        self.neighbor_stats = np.zeros((2, self.n))
+        self.neighbor_stats[0] = np.inf
+
+    def profile(self, profiler):
+        # Time the phases of every step with profiler (see profiler.Profiler)
+        self.profiler = profiler
+
+    def lap(self, phase):
+        if self.profiler is not None:
+            self.profiler.lap(phase)
+
+    def record_neighbors(self, start, stop, observer, dist):
+        # Nearest-neighbour distance and number of touching bodies of birds start..stop
+        nearest = np.full(stop - start, np.inf)
+        np.minimum.at(nearest, observer, dist)
+        self.neighbor_stats[0, start:stop] = nearest
+        self.neighbor_stats[1, start:stop] = np.bincount(observer, dist < self.bl, minlength=stop - start)
+
+    def displacement(self, dx, dy):
+        # Minimum-image differences in grid mode, plain differences otherwise
+        if self.neighbors == 'grid':
+            return minimum_image(dx, self.width), minimum_image(dy, self.height)
+        return dx, dy
+
+    def pairwise(self, start, stop):
+        # Vectors from birds start..stop to every bird, shape (stop - start, n)
+        dx = self.x[None, :] - self.x[start:stop, None]
+        dy = self.y[None, :] - self.y[start:stop, None]
+        return dx, dy, np.hypot(dx, dy)
+
+    def flock_forces(self, start, stop):
+        """
+        Separation/cohesion and gradient terms of Bird.update for birds start..stop.
+
+        Returns:
+        tuple: Arrays dspeed and dangle.
+        """
+        dx, dy, dist = self.pairwise(start, stop)
+        rows = np.arange(start, stop)
+        others = np.ones(dist.shape, dtype=bool)
+        others[rows - start, rows] = False
+
+        angle_diffs = (np.arctan2(dy, dx) - self.angle[start:stop, None]) % (2 * np.pi)
+        wrapped = np.where(angle_diffs > np.pi, angle_diffs - 2 * np.pi, angle_diffs)
+
+        with np.errstate(divide='ignore'):
+            inv_dist = np.where(dist > 0, 1 / dist, 0)
+
+        if self.neighbor_stats is not None:
+            self.neighbor_stats[0, start:stop] = np.where(others, dist, np.inf).min(axis=1)
+            self.neighbor_stats[1, start:stop] = (others & (dist < self.bl)).sum(axis=1)
+        self.lap('neighbors')
+
+        count = max(self.n - 1, 1)
+        if self.occlusion:
+            # Leave out the birds hidden behind closer ones
+            row, col = np.nonzero(others & (dist < self.radius * 4))
+            hidden = ~visible_pairs(row, dx[row, col], dy[row, col], dist[row, col], self.bl / 2)
+            others[row[hidden], col[hidden]] = False
+            count = np.maximum(others.sum(axis=1), 1)
+            self.lap('vision')
+
+        # Separate from birds that are too close, cohere towards birds at an ideal distance
+        separate = others & (dist < self.radius * 2)
+        cohere = others & ~separate & (dist < self.radius * 4)
+        sign = cohere.astype(float) - separate
+
+        dspeed = self.alpha_0 * (sign * inv_dist).sum(axis=1)
+        dangle = self.beta_0 * (sign * wrapped * inv_dist).sum(axis=1)
+
+        # Spatial and angular gradients based on the average speed and angle of the others
+        avg_speed = (self.speed.sum() - self.speed[start:stop]) / max(self.n - 1, 1)
+        avg_angle = np.where(others, angle_diffs, 0).sum(axis=1) / count
+
+        dspeed += self.alpha_1 * (avg_speed - self.speed[start:stop])
+        dangle += self.beta_1 * (avg_angle - self.angle[start:stop])
+        return dspeed, dangle
+
+    def grid_flock_forces(self, start, stop):
+        # Same rules as flock_forces, summed over the pairs within perception range only
+        i, j, dx, dy, dist = self.pairs(start, stop)
+        if self.occlusion:
+            seen = visible_pairs(i, dx, dy, dist, self.bl / 2)
+            i, dx, dy, dist = i[seen], dx[seen], dy[seen], dist[seen]
+            self.lap('vision')
+        self.lap('neighbors')
+        perceived = np.maximum(np.bincount(i, minlength=stop - start), 1)
+        return self.pair_forces(start, stop, i, dx, dy, dist, perceived)
+
+    def tree_flock_forces(self, start, stop):
+        # flock_forces, or grid_flock_forces in grid mode, with the far birds summed by groups from the quadtree
+        periodic = self.neighbors == 'grid'
+        i, weight, dx, dy, dist, single, band, side = self.tree.walk(
+            self.x[start:stop], self.y[start:stop], self.angle[start:stop], self.theta,
+            radii=(self.radius * 2, self.radius * 4), limit=self.radius * 4 if periodic else None,
+            exclude=np.arange(start, stop))
+        if self.neighbor_stats is not None:
+            # From the birds summed one by one only, a group is at least 1 / theta - 1 times its size away
+            self.record_neighbors(start, stop, i[single], dist[single])
+        self.lap('neighbors')
+        if periodic:
+            count = np.maximum(np.bincount(i, weight, minlength=stop - start), 1)
+        else:
+            count = max(self.n - 1, 1)
+        return self.pair_forces(start, stop, i, dx, dy, dist, count, weight, band, side)
+
+    def pair_forces(self, start, stop, i, dx, dy, dist, count, weight=None, band=None, side=None):
+        """
+        Rules of flock_forces summed over a list of pairs.
+
+        Parameters:
+        - i (numpy.ndarray): Observer of every pair, counted from start.
+        - dx, dy, dist (numpy.ndarray): Vector and distance from the observer to the other bird.
+        - count (numpy.ndarray): Number of birds the angular gradient averages over, per observer.
+        - weight (numpy.ndarray): Number of birds every pair stands for, None for one.
+        - band, side (numpy.ndarray): For the parts of groups split by a boundary (see QuadTree.walk),
+          the number of the radii 2 * radius and 4 * radius below their birds, or their side of the
+          observer's heading line, -1 and 0 elsewhere.
+
+        Returns:
+        tuple: Arrays dspeed and dangle.
+        """
+        rows = stop - start
+        angle_diffs = (np.arctan2(dy, dx) - self.angle[start:stop][i]) % (2 * np.pi)
+        wrapped = np.where(angle_diffs > np.pi, angle_diffs - 2 * np.pi, angle_diffs)
+
+        with np.errstate(divide='ignore'):
+            inv_dist = np.where(dist > 0, 1 / dist, 0)
+        # Separate below radius * 2, cohere up to radius * 4
+        sign = np.where(dist < self.radius * 2, -1.0, np.where(dist < self.radius * 4, 1.0, 0.0))
+
+        if band is not None:
+            sign = np.where(band >= 0, np.array([-1.0, 1.0, 0.0])[band], sign)
+        if side is not None:
+            # The angles in [0, 2 pi) jump straight ahead of the observer and the wrapped ones behind,
+            # the part of a group on the right of the line is 2 pi further where the angle jumps
+            ahead = (side != 0) & (np.abs(wrapped) < np.pi / 2)
+            behind = (side != 0) & ~ahead
+            angle_diffs = np.where(ahead, wrapped + 2 * np.pi * (side > 0), angle_diffs)
+            wrapped = np.where(behind, angle_diffs - 2 * np.pi * (side > 0), wrapped)
+        if weight is not None:
+            sign = sign * weight
+            angle_diffs = angle_diffs * weight
+
+        dspeed = self.alpha_0 * np.bincount(i, sign * inv_dist, minlength=rows)
+        dangle = self.beta_0 * np.bincount(i, sign * wrapped * inv_dist, minlength=rows)
+
+        avg_speed = (self.speed.sum() - self.speed[start:stop]) / max(self.n - 1, 1)
+        avg_angle = np.bincount(i, angle_diffs, minlength=rows) / count
+
+        dspeed += self.alpha_1 * (avg_speed - self.speed[start:stop])
+        dangle += self.beta_1 * (avg_angle - self.angle[start:stop])
+        return dspeed, dangle
+
+    def pairs(self, start=0, stop=None):
+        """
+        Every (observer, neighbour) pair within perception range, for observers start..stop.
+
+        Returns:
+        tuple: Arrays observer (counted from start), neighbour, dx, dy and distance to the neighbour.
+        """
+        stop = self.n if stop is None else stop
+        pairs = self.find_pairs(start, stop)
+        if self.neighbor_stats is not None:
+            self.record_neighbors(start, stop, pairs[0], pairs[4])
+        return pairs
+
+    def find_pairs(self, start, stop):
+        # Pairs from the cell list or from the pairwise distances, see pairs()
+        if self.neighbors == 'grid':
+            return self.grid.neighbors(self.x[start:stop], self.y[start:stop], self.radius * 4,
+                                       exclude=np.arange(start, stop))
+        blocks = [(np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0), np.empty(0), np.empty(0))]
+        for block in range(start, stop, BLOCK_SIZE):
+            end = min(block + BLOCK_SIZE, stop)
+            dx, dy, dist = self.pairwise(block, end)
+            dist[np.arange(end - block), np.arange(block, end)] = np.inf
+            row, col = np.nonzero(dist < self.radius * 4)
+            blocks.append((row + block - start, col, dx[row, col], dy[row, col], dist[row, col]))
+        return tuple(np.concatenate(parts) for parts in zip(*blocks))
+
+    def visual_field(self, start=0, stop=None):
+        # Visual field of birds start..stop, see visual_field.project
+        stop = self.n if stop is None else stop
+        observer, _, dx, dy, dist = self.pairs(start, stop)
+        self.lap('neighbors')
+        return project(observer, dx, dy, dist, self.angle[start:stop], self.bl / 2, stop - start)
+
+    def vision_forces(self, start, stop):
+        # dv = gamma (v0 - v) + alpha_0 * integral of cos(phi) (-V + alpha_1 dV^2)
+        # dpsi = beta_0 * integral of sin(phi) (-V + beta_1 dV^2)
+        field = self.visual_field(start, stop)
+        self.lap('vision')
+        front, side, edge_cos, edge_sin = field_forces(field, stop - start)
+        dspeed = GAMMA * (V0 - self.speed[start:stop]) + self.alpha_0 * (front + self.alpha_1 * edge_cos)
+        dangle = self.beta_0 * (side + self.beta_1 * edge_sin)
+        return dspeed, dangle
+
+    def forces(self, start, stop):
+        """
+        Changes of speed and heading of birds start..stop from the current state.
+
+        Returns:
+        tuple: Arrays dspeed, dangle, the speed cap and the turning factor.
+        """
+        if self.interaction == 'vision':
+            dspeed, dangle = self.vision_forces(start, stop)
+        elif self.theta is not None:
+            dspeed, dangle = self.tree_flock_forces(start, stop)
+        elif self.neighbors == 'grid':
+            dspeed, dangle = self.grid_flock_forces(start, stop)
+        else:
+            dspeed, dangle = self.flock_forces(start, stop)
+        max_speed = np.full(stop - start, float(self.max_speed))
+        turn = np.ones(stop - start)
+
+        if self.predator.any():
+            predator_forces(self, start, stop, dspeed, dangle, max_speed, turn)
+        self.lap('forces')
+        return dspeed, dangle, max_speed, turn
+
+    def prepare(self):
+        # Structures shared by all partitions of a step
+        if self.neighbors == 'grid':
+            self.grid = CellList(self.width, self.height, self.radius * 4).build(self.x, self.y)
+            self.lap('neighbors')
+        if self.theta is not None:
+            self.tree = QuadTree(self.width, self.height, periodic=self.neighbors == 'grid').build(self.x, self.y)
+            self.lap('neighbors')
+        index_predators(self)
+
+    def update(self, start, stop, out):
+        """
+        Move birds start..stop, reading the front buffer and writing their new state into out.
+        """
+        dspeed, dangle, max_speed, turn = self.forces(start, stop)
+
+        # Cap the speed to a maximum value to maintain control
+        speed = np.minimum(self.speed[start:stop] + dspeed * DELTA_T, max_speed)
+        angle = self.angle[start:stop] + dangle * DELTA_T * turn
+        angle += normalize_angles(dangle * DELTA_T)
+
+        # Update position with the adjusted speed and angle, wrapping around the screen
+        x = (self.x[start:stop] + np.cos(angle) * speed) % self.width
+        y = (self.y[start:stop] + np.sin(angle) * speed) % self.height
+        out[:, start:stop] = x, y, angle, speed
+        self.lap('integration')
+
+    def step(self):
+        if self.profiler is not None:
+            self.profiler.frame()
+        if self.sequential:
+            # Each bird moves in place and the next one already sees it moved
+            for i in range(self.n):
+                self.update(i, i + 1, self.state)
+        else:
+            self.prepare()
+            for start in range(0, self.n, BLOCK_SIZE):
+                self.update(start, min(start + BLOCK_SIZE, self.n), self.back)
+            self.swap()
+        self.finish_step()
+
+    def approximation_error(self, sample=1000):
+        """
+        Error of the Barnes-Hut sums against the exact sums, at the current state.
+
+        Only the flocking rules are compared, the predator rules are exact.
+
+        Parameters:
+        - sample (int): Compare the forces on the first this many birds.
+
+        Returns:
+        dict: Number of birds compared, and for dspeed and dangle the RMS
+        and the largest error, both relative to the RMS of the exact values.
+        """
+        if self.theta is None:
+            raise ValueError("Only a flock with theta set approximates its sums")
+        stop = min(sample, self.n)
+        # Leave the metrics and the profile of the run alone
+        neighbor_stats, profiler = self.neighbor_stats, self.profiler
+        self.neighbor_stats = self.profiler = None
+        approximate, reference = np.zeros((2, 2, stop))
+        try:
+            self.prepare()
+            exact = self.grid_flock_forces if self.neighbors == 'grid' else self.flock_forces
+            for start in range(0, stop, BLOCK_SIZE):
+                end = min(start + BLOCK_SIZE, stop)
+                approximate[:, start:end] = self.tree_flock_forces(start, end)
+                reference[:, start:end] = exact(start, end)
+        finally:
+            self.neighbor_stats, self.profiler = neighbor_stats, profiler
+
+        summary = {'birds': stop}
+        for name, values, exact_values in zip(('dspeed', 'dangle'), approximate, reference):
+            error = np.abs(values - exact_values)
+            scale = np.sqrt(np.mean(exact_values ** 2)) if stop else 0.0
+            summary[f'{name}_error'] = float(np.sqrt(np.mean(error ** 2)) / scale) if scale > 0 else 0.0
+            summary[f'{name}_error_max'] = float(error.max(initial=0) / scale) if scale > 0 else 0.0
+        return summary
+
+    def finish_step(self):
+        # Bookkeeping after all birds moved
+        self.update_tails()
+        self.lap('tails')
+        if self.metrics is not None:
+            self.metrics.update(self)
+            self.lap('metrics')
+
+    def update_tails(self):
+        if self.tails is None:
+            return
+        # Add the new position as the newest tail point
+        self.tail_head = (self.tail_head + 1) % self.tail_capacity
+        points = np.stack([self.x, self.y], axis=1)
+        if self.tails == 'uint16':
+            points = (np.round(points * self.tail_scale()).astype(np.int64) % TAIL_LEVELS).astype(np.uint16)
+        self.tail_points[np.arange(self.n), self.tail_head] = points
+
+        # The tail grows while it is shorter than the speed allows, otherwise the oldest point drops out
+        dynamic_tail_length = (self.speed / self.max_speed * self.max_tail_length).astype(int)
+        grow = self.tail_length + 1 <= dynamic_tail_length
+        self.tail_length = np.minimum(self.tail_length + grow, self.tail_capacity)
+
+    def ordered_tails(self, birds=None):
+        """
+        Tail points of every bird, or of the given birds, from the newest to the oldest.
+
+        Returns:
+        tuple: Points of shape (n, tail_capacity, 2), valid up to the tail lengths, and the lengths.
+        """
+        birds = np.arange(self.n) if birds is None else np.asarray(birds)
+        if self.tails is None:
+            return np.zeros((len(birds), 0, 2)), self.tail_length[birds]
+        index = (self.tail_head[birds, None] - np.arange(self.tail_capacity)[None, :]) % self.tail_capacity
+        return self.tail_positions(self.tail_points[birds[:, None], index]), self.tail_length[birds]
+
+    def tail(self, i):
+        # Tail of bird i as a list of (x, y) points, the newest first
+        if self.tails is None:
+            return []
+        index = (self.tail_head[i] - np.arange(self.tail_length[i])) % self.tail_capacity
+        return [tuple(point) for point in self.tail_positions(self.tail_points[i, index]).tolist()]
+
+    def tail_scale(self):
+        # Steps of the uint16 tail points per unit of x and y
+        return np.array([TAIL_LEVELS / self.width, TAIL_LEVELS / self.height])
+
+    def tail_positions(self, points):
+        # World positions of stored tail points
+        if self.tails == 'uint16':
+            return points / self.tail_scale()
+        return points
+
+
+class Bird:
+    """
+    View of one bird of a Flock, keeps the attribute interface of the original Bird class.
+    """
+
+    def __init__(self, flock, index):
+        self.flock = flock
+        self.index = index
+        self.v = 2 # Initial velocity
+
+    @property
+    def x(self):
+        return float(self.flock.x[self.index])
+
+    @x.setter
+    def x(self, value):
+        self.flock.x[self.index] = value
+
+    @property
+    def y(self):
+        return float(self.flock.y[self.index])
+
+    @y.setter
+    def y(self, value):
+        self.flock.y[self.index] = value
+
+    @property
+    def angle(self):
+        return float(self.flock.angle[self.index])
+
+    @angle.setter
+    def angle(self, value):
+        self.flock.angle[self.index] = value
+
+    @property
+    def speed(self):
+        return float(self.flock.speed[self.index])
+
+    @speed.setter
+    def speed(self, value):
+        self.flock.speed[self.index] = value
+
+    @property
+    def predator(self):
+        return bool(self.flock.predator[self.index])
+
+    @predator.setter
+    def predator(self, value):
+        self.flock.predator[self.index] = value
+
+    @property
+    def bl(self):
+        return self.flock.bl
+
+    @property
+    def radius(self):
+        return self.flock.radius
+
+    @property
+    def tail(self):
+        return self.flock.tail(self.index)
+
+    def distance_to(self, other):
+        dx = other.x - self.x
+        dy = other.y - self.y
+        return math.sqrt(dx * dx + dy * dy)
+
+    @staticmethod
+    def normalize_angle(angle):
+        # Normalize angle to be between -pi and pi
+        while angle <= -math.pi:
+            angle += 2 * math.pi
+        while angle > math.pi:
+            angle -= 2 * math.pi
+        return angle
+
+    def move(self):
+        self.x = (self.x + self.v * math.cos(self.angle) * DELTA_T) % self.flock.width
+        self.y = (self.y + self.v * math.sin(self.angle) * DELTA_T) % self.flock.height
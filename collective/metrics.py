@@ -0,0 +1,153 @@
+import math
+from collections import deque
+
+import numpy as np
+
+from .spatial import minimum_image
+
+NAMES = ('polarization', 'milling', 'nn_distance', 'cohesion', 'collisions')
+
+
+class RunningStats:
+    # Running mean and variance (Welford), minimum and maximum of a series, or elementwise of arrays of series
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = np.minimum(self.min, value)
+        self.max = np.maximum(self.max, value)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+
+class Histogram:
+    # Counts in fixed bins, values outside [low, high) go to the under/overflow counts
+    def __init__(self, low, high, bins=50):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=int)
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, values):
+        values = np.atleast_1d(values)
+        values = values[np.isfinite(values)]
+        self.underflow += int((values < self.edges[0]).sum())
+        self.overflow += int((values >= self.edges[-1]).sum())
+        self.counts += np.histogram(values, self.edges)[0]
+
+
+class Window:
+    # Means over consecutive windows of steps, only the last keep windows are kept
+    def __init__(self, size=100, keep=1000):
+        self.size = size
+        self.series = deque(maxlen=keep)
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.total += value
+        self.count += 1
+        if self.count == self.size:
+            self.series.append(self.total / self.size)
+            self.total = 0.0
+            self.count = 0
+
+
+def centroid(flock):
+    # Centre of the flock in the wrap-around world, as the circular mean along each axis
+    center = []
+    for values, size in ((flock.x, flock.width), (flock.y, flock.height)):
+        phase = values / size * 2 * np.pi
+        center.append(np.arctan2(np.sin(phase).mean(), np.cos(phase).mean()) % (2 * np.pi) / (2 * np.pi) * size)
+    return center
+
+
+def order_parameters(flock):
+    """
+    Collective-order metrics of the current state of a flock.
+
+    The nearest-neighbour distances and contacts come from the neighbour
+    statistics the step records (see Flock.attach) instead of being
+    recomputed, so they describe the state the last step started from.
+    In grid mode and with interaction='vision', only birds within
+    perception range count as nearest neighbours.
+
+    Returns:
+    dict: Polarization, milling (rotation order), mean nearest-neighbour
+    distance, cohesion (mean distance to the centroid) and collisions
+    (pairs of overlapping bodies).
+    """
+    heading_x, heading_y = np.cos(flock.angle), np.sin(flock.angle)
+    cx, cy = centroid(flock)
+    rx = minimum_image(flock.x - cx, flock.width)
+    ry = minimum_image(flock.y - cy, flock.height)
+    distance = np.hypot(rx, ry)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rotation = np.where(distance > 0, (rx * heading_y - ry * heading_x) / distance, 0)
+
+    nearest, contacts = flock.neighbor_stats
+    nearest = nearest[np.isfinite(nearest)]
+    return {
+        'polarization': float(np.hypot(heading_x.mean(), heading_y.mean())),
+        'milling': float(abs(rotation.mean())),
+        'nn_distance': float(nearest.mean()) if len(nearest) else math.nan,
+        'cohesion': float(distance.mean()),
+        'collisions': float(contacts.sum() / 2),
+    }
+
+
+class Metrics:
+    """
+    Online aggregates of the order parameters, updated after every step of
+    the flock it is attached to, in constant memory.
+
+    Keeps the running mean, variance and extremes of every metric, a
+    histogram of the nearest-neighbour distances of all birds over the run
+    and the series of window means of every metric.
+    """
+
+    def __init__(self, window=100, keep=1000, every=1, nn_range=(0, 100), bins=50):
+        self.every = every
+        self.steps = 0
+        self.last = {}
+        self.stats = {name: RunningStats() for name in NAMES}
+        self.windows = {name: Window(window, keep) for name in NAMES}
+        self.nn_histogram = Histogram(*nn_range, bins)
+
+    def update(self, flock):
+        self.steps += 1
+        if self.steps % self.every:
+            return
+        self.last = order_parameters(flock)
+        for name, value in self.last.items():
+            if math.isfinite(value):
+                self.stats[name].add(value)
+                self.windows[name].add(value)
+        self.nn_histogram.add(flock.neighbor_stats[0])
+
+    def summary(self):
+        """
+        Returns:
+        dict: Mean, standard deviation and last value of every metric.
+        """
+        result = {}
+        for name in NAMES:
+            # Plain floats, the running stats of a single series are numpy scalars
+            result[f'{name}_mean'] = float(self.stats[name].mean) if self.stats[name].count else math.nan
+            result[f'{name}_std'] = float(self.stats[name].std)
+            result[f'{name}_last'] = self.last.get(name, math.nan)
+        return result
@@ -0,0 +1,116 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .flock import Flock, BLOCK_SIZE, FIELDS
+
+_flock = None # Flock of a worker process, its buffers live in the shared memory
+_shm = None
+_prepared = None # Step the shared structures of the worker flock were built for
+
+
+def _layout(n, tracked, dtype=float):
+    # Shape, dtype and byte offset of every array in the shared memory block, and its total size
+    arrays = [('buffers', (2, len(FIELDS), n), dtype), ('predator', (n,), bool)]
+    if tracked:
+        arrays.append(('neighbor_stats', (2, n), float))
+    layout, offset = {}, 0
+    for name, shape, dtype in arrays:
+        layout[name] = (shape, dtype, offset)
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return layout, offset
+
+
+def _share(shm, n, tracked, dtype=float):
+    # The flock arrays as views into the shared memory block
+    layout, _ = _layout(n, tracked, dtype)
+    return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for name, (shape, dtype, offset) in layout.items()}
+
+
+def _attach(name, n, params, tracked):
+    global _flock, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _flock = Flock(np.zeros(n), np.zeros(n), np.zeros(n), **params)
+    for field, array in _share(_shm, n, tracked, params['dtype']).items():
+        setattr(_flock, field, array)
+
+
+def _update(front, step, start, stop):
+    global _prepared
+    _flock.front = front
+    # Cell list, quadtree and predator index once per step, whatever the partitions the worker gets
+    if _prepared != step:
+        _flock.prepare()
+        _prepared = step
+    # In blocks like Flock.step, so the pairwise matrices stay BLOCK_SIZE rows
+    for block in range(start, stop, BLOCK_SIZE):
+        _flock.update(block, min(block + BLOCK_SIZE, stop), _flock.back)
+
+
+class ParallelFlock:
+    """
+    Advance a Flock with its birds split into partitions updated on a process pool.
+
+    The flock's buffers are moved into shared memory. Every worker reads the
+    front buffer and writes its partition of the back buffer, then the
+    buffers are swapped, so the result is the same as Flock.step(). Every
+    worker builds the structures of a step (see Flock.prepare) once, before
+    its first partition of the step, and moves its partitions in blocks of
+    BLOCK_SIZE birds like Flock.step().
+
+    Use it as a context manager, or call close() to stop the workers and free
+    the shared memory.
+    """
+
+    def __init__(self, flock, workers=None, partitions=None):
+        if flock.sequential:
+            raise ValueError("Sequential updates cannot be partitioned")
+        self.flock = flock
+        self.workers = workers or os.cpu_count()
+        partitions = partitions or self.workers
+        bounds = np.linspace(0, flock.n, partitions + 1).astype(int)
+        self.partitions = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+        self.steps = 0
+
+        # Move the arrays the workers read and write into shared memory
+        tracked = flock.neighbor_stats is not None
+        dtype = flock.buffers.dtype
+        _, size = _layout(flock.n, tracked, dtype)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self.shared = _share(self.shm, flock.n, tracked, dtype)
+        for field, array in self.shared.items():
+            array[:] = getattr(flock, field)
+            setattr(flock, field, array)
+
+        self.pool = ProcessPoolExecutor(self.workers, initializer=_attach,
+                                        initargs=(self.shm.name, flock.n, flock.params(), tracked))
+
+    def step(self):
+        flock = self.flock
+        if flock.profiler is not None:
+            flock.profiler.frame()
+        self.steps += 1
+        futures = [self.pool.submit(_update, flock.front, self.steps, start, stop) for start, stop in self.partitions]
+        for future in futures:
+            future.result()
+        flock.lap('partitions')
+        flock.swap()
+        flock.finish_step()
+
+    def close(self):
+        # Give the flock private copies of its arrays again before freeing the shared memory
+        self.pool.shutdown()
+        for field, array in self.shared.items():
+            setattr(self.flock, field, array.copy())
+        self.shared = {}
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+
+from .spatial import CellList
+
+
+def index_predators(flock):
+    """
+    Index the predators of a flock for the batched predator and prey queries of a step.
+
+    flock.hunters holds the indices of the predators and flock.hunter_grid a
+    cell list of their positions, queried by the prey for the nearest
+    predator in range. The predators query flock.grid for the birds around
+    them; with neighbors='all' it is built here with cells wide enough for that.
+    """
+    flock.hunters = np.flatnonzero(flock.predator)
+    if not len(flock.hunters):
+        return
+    periodic = flock.neighbors == 'grid'
+    flock.hunter_grid = CellList(flock.width, flock.height, flock.radius, periodic).build(
+        flock.x[flock.hunters], flock.y[flock.hunters])
+    if flock.neighbors == 'all':
+        flock.grid = CellList(flock.width, flock.height, 2 * flock.radius, periodic=False).build(flock.x, flock.y)
+    flock.lap('neighbors')
+
+
+def predator_forces(flock, start, stop, dspeed, dangle, max_speed, turn):
+    """
+    Replace the forces of birds start..stop by the predator rules, in place.
+
+    Prey fly in the opposite direction of the nearest predator within radius
+    and speed up, predators head for the centroid of the birds within
+    2 * radius and accelerate to max_speed + 3, turning faster.
+
+    Parameters:
+    - flock (Flock): Flock with at least one predator, indexed by index_predators.
+    - dspeed, dangle, max_speed, turn (numpy.ndarray): Forces of birds start..stop, see Flock.forces.
+    """
+    if flock.sequential:
+        threat = nearest_threat(flock, start, stop)
+    else:
+        threat = grid_threat(flock, start, stop)
+    fleeing = np.flatnonzero(threat >= 0)
+    hunter = threat[fleeing]
+    rows = fleeing + start
+    away_x, away_y = flock.displacement(flock.x[rows] - flock.x[hunter], flock.y[rows] - flock.y[hunter])
+    dangle[fleeing] = np.arctan2(away_y, away_x) - flock.angle[rows]
+    dspeed[fleeing] = flock.max_speed
+    max_speed[fleeing] = flock.max_speed + 1
+
+    hunters = np.flatnonzero(flock.predator[start:stop])
+    if len(hunters):
+        if flock.sequential:
+            dspeed[hunters], dangle[hunters] = chase(flock, hunters + start)
+        else:
+            dspeed[hunters], dangle[hunters] = grid_chase(flock, hunters + start)
+        max_speed[hunters] = flock.max_speed + 3
+        turn[hunters] = 4 # Predator turns faster
+
+
+def chase(flock, rows):
+    # Predators head for the centroid of nearby birds and accelerate to max_speed + 3, one by one
+    dangle = np.empty(len(rows))
+    for k, i in enumerate(rows):
+        dist = np.hypot(flock.x - flock.x[i], flock.y - flock.y[i])
+        nearby = dist < 2 * flock.radius
+        nearby[i] = False
+        if not nearby.any():
+            nearby[0] = True
+        angle_to_centroid = math.atan2(flock.y[nearby].mean() - flock.y[i], flock.x[nearby].mean() - flock.x[i])
+        dangle[k] = flock.beta_1 * (angle_to_centroid - flock.angle[i])
+    dspeed = flock.alpha_1 * (flock.max_speed + 3 - flock.speed[rows])
+    return dspeed, dangle
+
+
+def grid_chase(flock, rows):
+    # chase for all predators at once, with the birds within 2 * radius from the cell list
+    q, _, dx, dy, _ = flock.grid.neighbors(flock.x[rows], flock.y[rows], 2 * flock.radius, exclude=rows)
+    count = np.bincount(q, minlength=len(rows))
+    to_x = np.bincount(q, dx, minlength=len(rows)) / np.maximum(count, 1)
+    to_y = np.bincount(q, dy, minlength=len(rows)) / np.maximum(count, 1)
+
+    # Without nearby birds, head for the first bird
+    alone = count == 0
+    to_x[alone], to_y[alone] = flock.displacement(flock.x[0] - flock.x[rows[alone]],
+                                                  flock.y[0] - flock.y[rows[alone]])
+
+    dangle = flock.beta_1 * (np.arctan2(to_y, to_x) - flock.angle[rows])
+    dspeed = flock.alpha_1 * (flock.max_speed + 3 - flock.speed[rows])
+    return dspeed, dangle
+
+
+def nearest_threat(flock, start, stop):
+    # Index of the nearest predator within radius of each bird start..stop, -1 if none
+    hunters = np.flatnonzero(flock.predator)
+    threat = np.full(stop - start, -1)
+    if len(hunters) == 0:
+        return threat
+    dist = np.hypot(flock.x[hunters][None, :] - flock.x[start:stop, None],
+                    flock.y[hunters][None, :] - flock.y[start:stop, None])
+    close = dist < flock.radius
+    close[flock.predator[start:stop]] = False # Predators never flee
+    found = close.any(axis=1)
+    threat[found] = hunters[np.where(close[found], dist[found], np.inf).argmin(axis=1)]
+    return threat
+
+
+def grid_threat(flock, start, stop):
+    # nearest_threat for birds start..stop at once, querying the cell list of the predators
+    q, p, _, _, dist = flock.hunter_grid.neighbors(flock.x[start:stop], flock.y[start:stop], flock.radius)
+    keep = ~flock.predator[start:stop][q] # Predators never flee
+    q, p, dist = q[keep], p[keep], dist[keep]
+    # The closest predator of every bird is the first of its run when sorted by bird and distance
+    order = np.lexsort((dist, q))
+    _, first = np.unique(q[order], return_index=True)
+    nearest = order[first]
+    threat = np.full(stop - start, -1)
+    threat[q[nearest]] = flock.hunters[p[nearest]]
+    return threat
@@ -0,0 +1,112 @@
+import time
+
+import numpy as np
+
+from .metrics import RunningStats
+
+
+class Profiler:
+    """
+    Time spent per phase of every frame, a frame being one step of the
+    flock and whatever is done with it before the next step, like drawing.
+
+    The code of a step calls lap(phase) at the end of each phase, which adds
+    the time since the previous lap to that phase; frame() starts a new
+    frame. The last window frames of every phase are kept for percentiles
+    and histograms, next to running statistics over the whole run.
+
+    A disabled profiler costs one attribute check per lap, so it can stay
+    attached and be switched on with toggle() while running.
+    """
+
+    def __init__(self, window=300, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.phases = {} # Phase name to ring buffer of the last window frame times in ms
+        self.stats = {}
+        self.frames = np.zeros(window) # Time between consecutive frames in ms
+        self.count = 0
+        self.totals = {}
+        self.mark = None
+        self.frame_start = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.totals = {}
+        self.mark = None
+        self.frame_start = None
+
+    def lap(self, phase):
+        if not self.enabled or self.mark is None:
+            return
+        now = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0.0) + now - self.mark
+        self.mark = now
+
+    def frame(self):
+        # Store the times of the frame that ended and start the next one
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            slot = self.count % self.window
+            for phase in self.totals:
+                if phase not in self.phases:
+                    self.phases[phase] = np.zeros(self.window)
+                    self.stats[phase] = RunningStats()
+            for phase, times in self.phases.items():
+                value = self.totals.get(phase, 0.0) * 1000
+                times[slot] = value
+                self.stats[phase].add(value)
+            self.frames[slot] = (now - self.frame_start) * 1000
+            self.count += 1
+        self.totals = {}
+        self.mark = self.frame_start = now
+
+    def recent(self, phase=None):
+        # Times of the frames in the window, of one phase or of whole frames
+        times = self.frames if phase is None else self.phases[phase]
+        return times[:min(self.count, self.window)]
+
+    def fps(self):
+        frames = self.recent()
+        return 1000 / frames.mean() if len(frames) and frames.mean() > 0 else 0.0
+
+    def histogram(self, phase, bins=20):
+        """
+        Histogram of the times of a phase over the window.
+
+        Returns:
+        tuple: Counts and bin edges in milliseconds, as numpy.histogram.
+        """
+        return np.histogram(self.recent(phase), bins)
+
+    def summary(self):
+        """
+        Returns:
+        dict: Per phase the mean and standard deviation over the run and the
+        median, 99th percentile and maximum over the window, in milliseconds.
+        """
+        result = {}
+        for phase, stats in self.stats.items():
+            times = self.recent(phase)
+            result[phase] = {
+                'mean_ms': float(stats.mean),
+                'std_ms': float(stats.std),
+                'p50_ms': float(np.percentile(times, 50)),
+                'p99_ms': float(np.percentile(times, 99)),
+                'max_ms': float(times.max()),
+            }
+        return result
+
+    def report(self):
+        # The summary as a table, with the share of the frame time of every phase
+        lines = [f"{'phase':<12} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'share':>6}"]
+        summary = self.summary()
+        total = sum(row['mean_ms'] for row in summary.values())
+        for phase, row in summary.items():
+            share = row['mean_ms'] / total if total > 0 else 0
+            lines.append(f"{phase:<12} {row['mean_ms']:9.3f} {row['p50_ms']:9.3f} {row['p99_ms']:9.3f} "
+                         f"{row['max_ms']:9.3f} {share:6.1%}")
+        lines.append(f"{self.count} frames, {self.fps():.1f} frames/s over the last {min(self.count, self.window)}")
+        return '\n'.join(lines)
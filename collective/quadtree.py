@@ -0,0 +1,233 @@
+import numpy as np
+
+from .spatial import minimum_image
+
+LEAF_SIZE = 8 # Nodes with at most this many points are never taken as a whole, their points are summed one by one
+MAX_DEPTH = 16 # Levels below the root at most, 16 bits per axis of the Morton codes
+SPLIT_SLOPE = 1.702 # Logistic approximation of the normal distribution, 1 / (1 + exp(-1.702 z))
+
+
+def spread_bits(v):
+    # Insert a zero bit between the 16 lowest bits of v, the x or y half of a Morton code
+    v = v & 0xFFFF
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+class QuadTree:
+    """
+    Quadtree over a set of points for Barnes-Hut sums.
+
+    build() sorts the points along a Morton curve over their bounding
+    square, so the points of every node are a contiguous run of the sorted
+    points, and keeps per level the occupied nodes with their number of points
+    centre of mass and spread. walk() answers a whole batch of queries level by level:
+    a node far enough from a query is taken as a whole, as that many points at
+    its centre of mass, the others are opened, and the points of opened nodes
+    with at most leaf_size points are taken one by one.
+
+    Distances use the minimum-image convention, or plain differences with
+    periodic=False, like CellList. A node is never taken as a whole when its
+    points could be in different images of the query.
+    """
+
+    def __init__(self, width, height, periodic=True, leaf_size=LEAF_SIZE, max_depth=MAX_DEPTH):
+        self.width = width
+        self.height = height
+        self.periodic = periodic
+        self.leaf_size = leaf_size
+        self.max_depth = max_depth
+        self.x = self.y = None
+        self.levels = []
+
+    def build(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if self.periodic:
+            x, y = x % self.width, y % self.height
+        self.x, self.y = x, y
+
+        # Square cells over the bounding box of the points, 2**max_depth per side at the deepest level
+        self.x0, self.y0 = (x.min(), y.min()) if len(x) else (0.0, 0.0)
+        side = max(x.max() - self.x0, y.max() - self.y0, 1e-9) * (1 + 1e-9) if len(x) else 1.0
+        self.diagonal = side * np.sqrt(2) # Largest distance between two points of the root, or a point and its centre
+        cells = 2 ** self.max_depth
+        ix = np.minimum(((x - self.x0) / side * cells).astype(np.int64), cells - 1)
+        iy = np.minimum(((y - self.y0) / side * cells).astype(np.int64), cells - 1)
+        code = spread_bits(ix) | (spread_bits(iy) << 1)
+        self.order = np.argsort(code, kind='stable')
+        code = code[self.order]
+        # Relative to the corner of the root, for the second moments
+        sorted_x, sorted_y = x[self.order] - self.x0, y[self.order] - self.y0
+        moments = (sorted_x, sorted_y, sorted_x * sorted_x, sorted_x * sorted_y, sorted_y * sorted_y)
+
+        # Occupied nodes of every level down to the first level where every node is small enough
+        self.levels = []
+        for level in range(self.max_depth + 1):
+            key = code >> (2 * (self.max_depth - level))
+            starts = np.flatnonzero(np.diff(key, prepend=-1)) if len(key) else np.empty(0, dtype=int)
+            counts = np.diff(np.append(starts, len(key)))
+            mx, my, mxx, mxy, myy = (np.add.reduceat(values, starts) / counts if len(key) else np.empty(0)
+                                     for values in moments)
+            self.levels.append({
+                'key': key[starts],
+                'start': starts,
+                'count': counts,
+                'x': mx + self.x0,
+                'y': my + self.y0,
+                # Covariance of the points of every node
+                'xx': np.maximum(mxx - mx * mx, 0),
+                'xy': mxy - mx * my,
+                'yy': np.maximum(myy - my * my, 0),
+            })
+            if not len(counts) or counts.max() <= self.leaf_size:
+                break
+        # Children of every node, a run of the next level
+        for parent, child in zip(self.levels[:-1], self.levels[1:]):
+            parent['first'] = np.searchsorted(child['key'], parent['key'] << 2)
+            parent['children'] = np.searchsorted(child['key'], (parent['key'] << 2) + 4) - parent['first']
+        return self
+
+    def displacement(self, dx, dy):
+        if self.periodic:
+            return minimum_image(dx, self.width), minimum_image(dy, self.height)
+        return dx, dy
+
+    def walk(self, qx, qy, heading, theta, radii=(), limit=None, exclude=None):
+        """
+        Points near each query one by one and far nodes as a whole.
+
+        A node is taken as a whole when it is seen from the query under an
+        angle below theta (its cell diagonal over the distance to its centre
+        of mass), all its points are on the same side of every radius in
+        radii and of the heading line of the query, the line along which a
+        bearing relative to the heading wraps around straight ahead or
+        behind. Every quantity depending on the distance through radii and on
+        the relative bearing is then smooth over the node.
+
+        A node split by one of these boundaries is taken as two parts, one on
+        either side, when it is seen under an angle below theta ** 2. The
+        share of its points on each side is estimated from the spread of the
+        node across the boundary, taken as normal, and the part stands for
+        that share of the points at the centre of mass of the node.
+
+        Parameters:
+        - qx, qy, heading (array): Query positions and headings.
+        - theta (float): Opening angle, 0 takes every point one by one.
+        - radii (tuple): Increasing distances at which a summed quantity changes form.
+        - limit (float): Leave out the points at this distance or farther, None to keep all.
+        - exclude (array): Index of a point to skip for each query, usually the query itself.
+
+        Returns:
+        tuple: Arrays query index, weight (number of points), dx, dy and
+        distance to the point or centre of mass, True where the entry is a
+        single point, and for the parts of split nodes the number of radii
+        below their points and their side of the heading line (1 right, -1
+        left). The last two are -1 and 0 for the other entries.
+        """
+        qx = np.asarray(qx, dtype=float)
+        qy = np.asarray(qy, dtype=float)
+        heading = np.asarray(heading, dtype=float)
+        radii = np.asarray(radii, dtype=float)
+        parts = [(np.empty(0, dtype=int), np.empty(0), np.empty(0), np.empty(0), np.empty(0),
+                  np.empty(0, dtype=bool), np.empty(0, dtype=int), np.empty(0, dtype=int))]
+        query = np.arange(len(qx)) if self.levels and len(self.levels[0]['count']) else np.empty(0, dtype=int)
+        node = np.zeros(len(query), dtype=int)
+        for depth, level in enumerate(self.levels):
+            if not len(query):
+                break
+            dx, dy = self.displacement(level['x'][node] - qx[query], level['y'][node] - qy[query])
+            dist = np.hypot(dx, dy)
+            size = self.diagonal / 2 ** depth
+            if limit is not None:
+                inside = dist - size < limit
+                query, node, dx, dy, dist = query[inside], node[inside], dx[inside], dy[inside], dist[inside]
+            count = level['count'][node]
+
+            # Nodes far enough, and how many boundaries cross them
+            whole = size < theta * dist
+            if self.periodic:
+                whole &= (np.abs(dx) + size <= self.width / 2) & (np.abs(dy) + size <= self.height / 2)
+            taken = np.flatnonzero(whole)
+            crossed = np.zeros(len(taken), dtype=int)
+            band = np.searchsorted(radii, dist[taken] - size, side='right')
+            crossed += np.searchsorted(radii, dist[taken] + size, side='right') - band
+            # Offset of the centre to the right of the heading line
+            cos, sin = np.cos(heading[query[taken]]), np.sin(heading[query[taken]])
+            right = sin * dx[taken] - cos * dy[taken]
+            on_line = np.abs(right) <= size
+            crossed += on_line
+            split = (crossed == 1) & (size < theta * theta * dist[taken])
+            keep = (crossed == 0) | split
+            taken, band, on_line, split = taken[keep], band[keep], on_line[keep], split[keep]
+            cos, sin, right = cos[keep], sin[keep], right[keep]
+            whole[:] = False
+            whole[taken] = True
+
+            q, k = query[taken], node[taken]
+            unsplit = taken[~split]
+            parts.append((query[unsplit], count[unsplit].astype(float), dx[unsplit], dy[unsplit], dist[unsplit],
+                          np.zeros(len(unsplit), dtype=bool), np.full(len(unsplit), -1),
+                          np.zeros(len(unsplit), dtype=int)))
+
+            # Split nodes: the share on the near side of a radius, or on the right of the heading line
+            split = np.flatnonzero(split)
+            if len(split):
+                q, k = q[split], k[split]
+                dx_s, dy_s, dist_s = dx[taken[split]], dy[taken[split]], dist[taken[split]]
+                line = on_line[split]
+                radial = ~line
+                radius = radii[np.minimum(band[split], len(radii) - 1)] if len(radii) else np.zeros(len(split))
+                # Normal of the boundary through the centre towards the near or the right side, and offset along it
+                normal_x = np.where(line, sin[split], -dx_s / dist_s)
+                normal_y = np.where(line, -cos[split], -dy_s / dist_s)
+                offset = np.where(line, right[split], radius - dist_s)
+                spread = np.sqrt(np.maximum(normal_x * normal_x * level['xx'][k] +
+                                            2 * normal_x * normal_y * level['xy'][k] +
+                                            normal_y * normal_y * level['yy'][k], 0))
+                with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+                    share = 1 / (1 + np.exp(-SPLIT_SLOPE * offset / spread))
+                # Points all on the boundary, or a spread lost to rounding
+                share = np.where(np.isnan(share), 0.5, share)
+
+                weight = count[taken[split]]
+                near = (weight * share, np.where(radial, band[split], -1), np.where(line, 1, 0))
+                far = (weight * (1 - share), np.where(radial, band[split] + 1, -1), np.where(line, -1, 0))
+                # Nothing of a node beyond limit
+                beyond = radial & (radius >= limit) if limit is not None else np.zeros(len(split), dtype=bool)
+                for (part_weight, part_band, part_side), kept in ((near, np.ones(len(split), dtype=bool)),
+                                                                  (far, ~beyond)):
+                    parts.append((q[kept], part_weight[kept], dx_s[kept], dy_s[kept], dist_s[kept],
+                                  np.zeros(np.count_nonzero(kept), dtype=bool), part_band[kept], part_side[kept]))
+
+            opened = ~whole
+            leaf = opened & ((count <= self.leaf_size) | (depth == len(self.levels) - 1))
+            parts.append(self.points(query[leaf], level['start'][node[leaf]], count[leaf], qx, qy, limit, exclude))
+
+            # Replace the other opened nodes by their children
+            inner = np.flatnonzero(opened & ~leaf)
+            if not len(inner):
+                break
+            children = level['children'][node[inner]]
+            query = np.repeat(query[inner], children)
+            offset = np.arange(children.sum()) - np.repeat(np.cumsum(children) - children, children)
+            node = np.repeat(level['first'][node[inner]], children) + offset
+        return tuple(np.concatenate(values) for values in zip(*parts))
+
+    def points(self, query, start, count, qx, qy, limit, exclude):
+        # Entries of the single points of runs start..start + count of the sorted points, for their queries
+        query = np.repeat(query, count)
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        point = self.order[np.repeat(start, count) + offset]
+        dx, dy = self.displacement(self.x[point] - qx[query], self.y[point] - qy[query])
+        dist = np.hypot(dx, dy)
+        keep = np.ones(len(point), dtype=bool)
+        if limit is not None:
+            keep &= dist < limit
+        if exclude is not None:
+            keep &= point != np.asarray(exclude)[query]
+        kept = np.count_nonzero(keep)
+        return (query[keep], np.ones(kept), dx[keep], dy[keep], dist[keep], np.ones(kept, dtype=bool),
+                np.full(kept, -1), np.zeros(kept, dtype=int))
@@ -0,0 +1,436 @@
+import numpy as np
+import pygame
+
+from .flock import HEIGHT, WIDTH
+from .spatial import CellList
+
+BG_COLOR = (255, 255, 255)
+TAIL_COLOR = (255, 165, 0)
+BIRD_COLOR = (0, 0, 0)
+PREDATOR_COLOR = (255, 0, 0)
+HUD_COLOR = (230, 230, 230, 200)
+
+MAX_ZOOM = 16 # Screen pixels per world unit at most
+ZOOM_STEP = 1.25 # Zoom factor of a mouse wheel notch or of the +/- keys
+CULL_CELLS = 8 # Cells of the render grid across the view
+MAX_CELLS = 2 ** 16 # Cells of the render grid at most, whatever the size of the world
+HEAT_TILE = 6 # Side of a heat map tile in screen pixels, at least
+MAX_DRAWN = 5000 # Birds in view drawn one by one at most, a heat map beyond
+
+
+def tail_tables(max_tail_length):
+    """
+    Colour and thickness of every tail segment, fading from the colour of
+    the tail and 5 px at the head to grey and 0 px at the end.
+
+    Returns:
+    tuple: Arrays of shape (max_tail_length + 1, max_tail_length, 3) and
+    (max_tail_length + 1, max_tail_length), indexed by number of segments and segment.
+    """
+    segments = np.arange(max_tail_length + 1)[:, None]
+    i = np.arange(max_tail_length)[None, :]
+    t = i / np.maximum(segments, 1)
+    fade = np.array([200 - 255, 200 - 165, 200 - 0])
+    colors = ((1 - t)[..., None] * fade + TAIL_COLOR).astype(int)
+    thickness = (5 * (1 - t)).astype(int)
+    return colors, thickness
+
+
+class Tails:
+    """
+    Draws the tails of a whole flock from its ring buffers. The clipping,
+    wrap-around splitting, colours and thicknesses of all segments are
+    computed at once, segments are clipped at the world boundaries and
+    continue beyond the edge where the tail wraps around. Drawing still
+    takes one pygame.draw.line call per visible segment: every segment has
+    its own colour and thickness, which pygame.draw.lines cannot vary.
+    """
+
+    def __init__(self, flock):
+        self.flock = flock
+        self.colors, self.thickness = tail_tables(flock.max_tail_length)
+
+    def segments(self, birds=None):
+        """
+        Every tail segment, bird by bird from the head of the tail.
+
+        Parameters:
+        - birds (numpy.ndarray): Indices of the birds whose tails to take, all by default.
+
+        Returns:
+        tuple: Arrays start (m, 2), end (m, 2), colour (m, 3) and thickness (m,).
+        """
+        flock = self.flock
+        width, height = flock.width, flock.height
+        points, lengths = flock.ordered_tails(birds)
+        num_segments = np.minimum(np.maximum(lengths - 1, 0), flock.max_tail_length)
+        bird, i = np.nonzero(np.arange(flock.max_tail_length)[None, :] < num_segments[:, None])
+
+        # Clip the tail segments at the screen boundaries
+        size = np.array([width - 1, height - 1])
+        start = np.clip(points[bird, i].astype(int), 0, size)
+        end = np.clip(points[bird, i + 1].astype(int), 0, size)
+
+        # Segments jumping across the screen continue beyond the edge instead
+        jump = np.abs(start - end) > np.array([width / 2, height / 2])
+        shift = np.where(start < end, -1, 1) * np.array([width, height])
+        end = np.where(jump, end + shift, end)
+
+        return start, end, self.colors[num_segments[bird], i], self.thickness[num_segments[bird], i]
+
+    def draw(self, screen, camera=None, birds=None):
+        start, end, colors, thickness = self.segments(birds)
+        if camera is not None:
+            # Both ends on the side of the start nearest to the centre of the view
+            sx, sy = camera.to_screen(start[:, 0], start[:, 1])
+            ex, ey = camera.to_screen(end[:, 0], end[:, 1], reference=(start[:, 0], start[:, 1]))
+            start = np.stack([sx, sy], axis=1).astype(int)
+            end = np.stack([ex, ey], axis=1).astype(int)
+            thickness = (thickness * camera.zoom).astype(int)
+
+        # Lines thinner than one pixel are not drawn by pygame anyway
+        visible = thickness > 0
+        if camera is not None:
+            # Nor lines off the screen
+            width, height = screen.get_size()
+            low = np.minimum(start, end) - thickness[:, None]
+            high = np.maximum(start, end) + thickness[:, None]
+            visible &= (high[:, 0] >= 0) & (low[:, 0] < width) & (high[:, 1] >= 0) & (low[:, 1] < height)
+        for a, b, color, width in zip(start[visible].tolist(), end[visible].tolist(),
+                                      colors[visible].tolist(), thickness[visible].tolist()):
+            pygame.draw.line(screen, color, a, b, width)
+
+
+def circle_stamp(radius):
+    # Pixel offsets pygame.draw.circle fills for a circle of this radius
+    size = 2 * radius + 3
+    stamp = pygame.Surface((size, size))
+    stamp.fill((0, 0, 0))
+    pygame.draw.circle(stamp, (255, 255, 255), (size // 2, size // 2), radius)
+    ox, oy = np.nonzero(pygame.surfarray.array2d(stamp))
+    return ox - size // 2, oy - size // 2
+
+
+class Sprites:
+    """
+    Draws all birds of a flock in one pass by writing their pixels through
+    pygame.surfarray, the pixels pygame.draw.circle would fill for every
+    bird, in black or in red for the predators.
+
+    Without a camera the world is drawn as it is, else through the camera
+    with circles scaled by its zoom. Only birds whose circle reaches into
+    the screen are drawn.
+    """
+
+    def __init__(self, flock):
+        self.flock = flock
+        self.stamps = {} # Pixel offsets of the circles by radius
+        self.colors = np.array([BIRD_COLOR, PREDATOR_COLOR], dtype=np.uint8)
+
+    def draw(self, screen, camera=None, birds=None):
+        flock = self.flock
+        birds = np.arange(flock.n) if birds is None else birds
+        if camera is None:
+            x, y = flock.x[birds].astype(int), flock.y[birds].astype(int)
+            radius = flock.bl // 2
+        else:
+            x, y = camera.to_screen(flock.x[birds], flock.y[birds])
+            x, y = x.astype(int), y.astype(int)
+            radius = int(flock.bl // 2 * camera.zoom)
+        if radius not in self.stamps:
+            self.stamps[radius] = circle_stamp(radius)
+        ox, oy = self.stamps[radius]
+
+        # Cull birds whose circle does not reach into the screen
+        width, height = screen.get_size()
+        margin = radius + 1
+        inside = (x > -margin) & (x < width + margin) & (y > -margin) & (y < height + margin)
+        index = np.flatnonzero(inside)
+
+        px = (x[index, None] + ox[None, :]).ravel()
+        py = (y[index, None] + oy[None, :]).ravel()
+        color = np.repeat(self.colors[flock.predator[birds[index]].astype(int)], len(ox), axis=0)
+        shown = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+
+        pixels = pygame.surfarray.pixels3d(screen)
+        pixels[px[shown], py[shown]] = color[shown]
+        del pixels # Unlock the screen
+
+
+def screen_size(flock):
+    # Window of the world size, at most the size of the simulation scripts' window
+    return min(flock.width, WIDTH), min(flock.height, HEIGHT)
+
+
+def heat_colors(levels):
+    """
+    Colours of the heat map, from the background through the tail colour to the bird colour.
+
+    Returns:
+    numpy.ndarray: Array of shape (levels, 3) of uint8.
+    """
+    t = np.linspace(0, 2, levels)[:, None]
+    low = (1 - t) * np.array(BG_COLOR) + t * np.array(TAIL_COLOR)
+    high = (2 - t) * np.array(TAIL_COLOR) + (t - 1) * np.array(BIRD_COLOR)
+    return np.where(t <= 1, low, high).round().astype(np.uint8)
+
+
+class Camera:
+    """
+    Part of the wrap-around world shown on a screen: the world point at the
+    centre of the screen and the zoom, in screen pixels per world unit.
+
+    Points are shown at their image nearest to the centre, so panning across
+    an edge of the world carries on from the other edge. The zoom goes from
+    the whole world fitting the screen (or 1 for a world smaller than the
+    screen) to MAX_ZOOM, and starts at the smallest.
+    """
+
+    def __init__(self, world, screen, center=None, zoom=None):
+        self.world = world
+        self.screen = screen
+        self.min_zoom = min(1.0, screen[0] / world[0], screen[1] / world[1])
+        self.center = (world[0] / 2, world[1] / 2) if center is None else center
+        self.zoom = self.min_zoom if zoom is None else zoom
+
+    def origin(self):
+        # World point at the top-left corner of the screen
+        return self.center[0] - self.screen[0] / 2 / self.zoom, self.center[1] - self.screen[1] / 2 / self.zoom
+
+    def bounds(self):
+        # World rectangle in view, it can reach past the edges of the world
+        x0, y0 = self.origin()
+        return x0, y0, x0 + self.screen[0] / self.zoom, y0 + self.screen[1] / self.zoom
+
+    def to_screen(self, x, y, reference=None):
+        """
+        Screen positions of world points.
+
+        Parameters:
+        - x, y (numpy.ndarray): World positions.
+        - reference (tuple): Points choosing the image of every point instead, like the start of a segment for its end.
+
+        Returns:
+        tuple: Screen positions x and y, as floats.
+        """
+        width, height = self.world
+        rx, ry = (x, y) if reference is None else reference
+        # Whole world sizes, points of the image around the centre are not moved at all
+        kx = np.round((rx - self.center[0]) / width)
+        ky = np.round((ry - self.center[1]) / height)
+        x0, y0 = self.origin()
+        return (x - kx * width - x0) * self.zoom, (y - ky * height - y0) * self.zoom
+
+    def pan(self, dx, dy):
+        # Move the view by dx, dy screen pixels, the world follows the mouse
+        self.center = ((self.center[0] - dx / self.zoom) % self.world[0],
+                       (self.center[1] - dy / self.zoom) % self.world[1])
+
+    def zoom_at(self, factor, position):
+        # Zoom by factor keeping the world point under a screen position in place
+        zoom = min(max(self.zoom * factor, self.min_zoom), MAX_ZOOM)
+        x0, y0 = self.origin()
+        wx, wy = x0 + position[0] / self.zoom, y0 + position[1] / self.zoom
+        self.zoom = zoom
+        self.center = ((wx - (position[0] - self.screen[0] / 2) / zoom) % self.world[0],
+                       (wy - (position[1] - self.screen[1] / 2) / zoom) % self.world[1])
+
+    def fit(self):
+        # Back to the whole world
+        self.center = (self.world[0] / 2, self.world[1] / 2)
+        self.zoom = self.min_zoom
+
+
+class HeatMap:
+    """
+    Number of birds per cell of a render grid, drawn as tiles coloured by
+    the logarithm of the count relative to the fullest tile in view.
+    """
+
+    def __init__(self, levels=256):
+        self.colors = heat_colors(levels)
+
+    def draw(self, screen, grid, camera):
+        counts = grid.counts()
+        x0, y0, x1, y1 = camera.bounds()
+        # Tiles in view, wrapped around the world
+        tx = np.arange(int(np.floor(x0 / grid.cell_width)), int(np.floor(x1 / grid.cell_width)) + 1)
+        ty = np.arange(int(np.floor(y0 / grid.cell_height)), int(np.floor(y1 / grid.cell_height)) + 1)
+        tiles = counts[np.ix_(ty % grid.ny, tx % grid.nx)].T
+        level = np.log1p(tiles) / np.log1p(max(tiles.max(), 1)) * (len(self.colors) - 1)
+        surface = pygame.surfarray.make_surface(self.colors[level.astype(int)])
+        size = (round(len(tx) * grid.cell_width * camera.zoom), round(len(ty) * grid.cell_height * camera.zoom))
+        position = ((tx[0] * grid.cell_width - x0) * camera.zoom, (ty[0] * grid.cell_height - y0) * camera.zoom)
+        screen.blit(pygame.transform.scale(surface, size), position)
+
+
+class Scene:
+    """
+    Frame of a flock seen through a camera: the background, the tails and
+    the birds, or a heat map of their density.
+
+    When the view is smaller than the world, the birds are sorted into a
+    grid of cells sized to the view and only those in cells within a tail
+    length of the view are drawn. When their circles would be under a pixel,
+    or more than max_drawn birds are in view, the frame is a heat map over
+    a grid of tiles of about HEAT_TILE pixels instead. The whole world at
+    zoom 1 is drawn exactly like the simulation scripts.
+    """
+
+    def __init__(self, flock, camera=None, max_drawn=MAX_DRAWN):
+        self.flock = flock
+        self.camera = Camera((flock.width, flock.height), screen_size(flock)) if camera is None else camera
+        self.max_drawn = max_drawn
+        self.tails = Tails(flock)
+        self.sprites = Sprites(flock)
+        self.heat_map = HeatMap()
+        self.mode = None # What the last frame showed, 'birds' or 'heat map'
+        self.drawn = 0 # Birds in cells in view in the last frame
+
+    def grid(self, cell_size):
+        # Render grid of cells of about cell_size, with no more than MAX_CELLS cells
+        flock = self.flock
+        cell_size = max(cell_size, np.sqrt(flock.width * flock.height / MAX_CELLS))
+        return CellList(flock.width, flock.height, cell_size).build(flock.x, flock.y)
+
+    def draw(self, screen):
+        flock, camera = self.flock, self.camera
+        screen.fill(BG_COLOR)
+        x0, y0, x1, y1 = camera.bounds()
+        radius = int(flock.bl // 2 * camera.zoom)
+        birds = None
+        if radius >= 1 and (x1 - x0 < flock.width or y1 - y0 < flock.height):
+            # Tails reach back up to max_tail_length steps at the fastest speed, that of hunting predators
+            margin = flock.max_tail_length * (flock.max_speed + 3) + flock.bl
+            grid = self.grid(max(x1 - x0, y1 - y0) / CULL_CELLS)
+            # Sorted, overlapping birds are drawn in the order of the flock
+            birds = np.sort(grid.in_rect(x0 - margin, y0 - margin, x1 + margin, y1 + margin))
+        self.drawn = flock.n if birds is None else len(birds)
+
+        if radius < 1 or self.drawn > self.max_drawn:
+            self.heat_map.draw(screen, self.grid(HEAT_TILE / camera.zoom), camera)
+            self.mode = 'heat map'
+        else:
+            self.tails.draw(screen, camera, birds)
+            self.sprites.draw(screen, camera, birds)
+            self.mode = 'birds'
+
+
+class Hud:
+    """
+    Overlay of the frames per second and the milliseconds per phase of a
+    profiler (see profiler.Profiler), averaged over the last frames.
+    """
+
+    def __init__(self, profiler, frames=30):
+        pygame.font.init()
+        self.font = pygame.font.Font(None, 18)
+        self.profiler = profiler
+        self.frames = frames
+
+    def draw(self, screen):
+        profiler = self.profiler
+        if not profiler.enabled or not profiler.count:
+            return
+        rows = [("FPS", f"{profiler.fps():.1f}")]
+        recent = min(profiler.count, profiler.window, self.frames)
+        slots = (profiler.count - 1 - np.arange(recent)) % profiler.window
+        for phase, times in profiler.phases.items():
+            rows.append((phase, f"{times[slots].mean():.2f} ms"))
+
+        # Names on the left, values aligned to the right
+        rows = [[self.font.render(text, True, BIRD_COLOR) for text in row] for row in rows]
+        name_width = max(name.get_width() for name, _ in rows)
+        value_width = max(value.get_width() for _, value in rows)
+        line_height = self.font.get_linesize()
+        panel = pygame.Surface((name_width + value_width + 20, line_height * len(rows) + 8), pygame.SRCALPHA)
+        panel.fill(HUD_COLOR)
+        for i, (name, value) in enumerate(rows):
+            y = 4 + i * line_height
+            panel.blit(name, (4, y))
+            panel.blit(value, (panel.get_width() - 4 - value.get_width(), y))
+        screen.blit(panel, (4, 4))
+
+
+class Viewer:
+    """
+    Pygame window subscribed to a run as a consumer, see runner.stream.
+
+    With blocking=True every step is drawn and the simulation is capped at fps,
+    like the original main loop. Otherwise frames are drawn at most fps times
+    per second while the simulation runs uncapped in between.
+
+    If the flock has a profiler, the drawing is timed too and P toggles
+    the profiler with its overlay.
+
+    The window shows the world through a camera (see Scene), of the world
+    size by default up to the size of the simulation scripts' window. The
+    mouse wheel and +/- zoom, dragging with the left button pans and F goes
+    back to the whole world.
+    """
+
+    def __init__(self, flock, fps=30, blocking=True, caption="Flocking Simulation", size=None):
+        # Set up the Pygame screen
+        size = screen_size(flock) if size is None else size
+        self.screen = pygame.display.set_mode(size)
+        pygame.display.set_caption(caption)
+        self.camera = Camera((flock.width, flock.height), size)
+        self.scene = Scene(flock, self.camera)
+        self.clock = pygame.time.Clock()
+        self.fps = fps
+        self.blocking = blocking
+        self.last_frame = None
+        self.profiler = flock.profiler
+        self.hud = Hud(flock.profiler) if flock.profiler is not None else None
+
+    def __call__(self, step, flock):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_p and self.profiler is not None:
+                self.profiler.toggle()
+            self.control(event)
+        self.lap('events')
+
+        if not self.blocking:
+            now = pygame.time.get_ticks()
+            if self.last_frame is not None and now - self.last_frame < 1000 / self.fps:
+                return True
+            self.last_frame = now
+
+        self.draw()
+        if self.blocking:
+            self.clock.tick(self.fps)
+            self.lap('wait')
+        return True
+
+    def control(self, event):
+        # Camera keys and mouse
+        camera = self.camera
+        center = (camera.screen[0] / 2, camera.screen[1] / 2)
+        if event.type == pygame.MOUSEWHEEL:
+            camera.zoom_at(ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+            camera.pan(*event.rel)
+        elif event.type == pygame.KEYDOWN:
+            if event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                camera.zoom_at(ZOOM_STEP, center)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                camera.zoom_at(1 / ZOOM_STEP, center)
+            elif event.key == pygame.K_f:
+                camera.fit()
+
+    def lap(self, phase):
+        if self.profiler is not None:
+            self.profiler.lap(phase)
+
+    def draw(self):
+        self.scene.draw(self.screen)
+        if self.hud is not None:
+            self.hud.draw(self.screen)
+        self.lap('draw')
+        pygame.display.flip()
+        self.lap('flip')
+
+    def close(self):
+        pygame.quit()
@@ -0,0 +1,109 @@
+import argparse
+
+import numpy as np
+import pygame
+
+from .flock import Flock
+from .render import Viewer
+from .trajectory import Trajectory
+
+SEEK_FRAMES = 100 # Frames skipped by the left and right arrow keys
+
+
+class Replay:
+    """
+    Plays a recorded trajectory through the usual drawing code, without
+    recomputing the model.
+
+    Keys: space pauses, left/right seek, up/down double or halve the
+    playback speed, home goes back to the start. The camera moves like in
+    the simulation window, see render.Viewer.
+    """
+
+    def __init__(self, path, speed=1.0, fps=30):
+        self.trajectory = Trajectory(path)
+        n = self.trajectory.n
+        self.flock = Flock(np.zeros(n), np.zeros(n), np.zeros(n), **self.trajectory.params)
+        self.viewer = Viewer(self.flock, fps=fps, caption=f"Replay {path}")
+        self.speed = speed
+        self.position = 0.0
+        self.frame = -1
+        self.paused = False
+
+    def seek(self, frame):
+        """
+        Show a frame, rebuilding the tails from the frames before it.
+        """
+        frame = int(np.clip(frame, 0, len(self.trajectory) - 1))
+        if frame == self.frame + 1:
+            self.trajectory.load(self.flock, frame)
+            self.flock.update_tails()
+        else:
+            self.flock.tail_length[:] = 0
+            for index in range(max(0, frame - 2 * self.flock.tail_capacity), frame + 1):
+                self.trajectory.load(self.flock, index)
+                self.flock.update_tails()
+        self.frame = frame
+        self.position = float(frame)
+
+    def handle(self, event):
+        if event.type == pygame.QUIT:
+            return False
+        self.viewer.control(event)
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_SPACE:
+                self.paused = not self.paused
+            elif event.key == pygame.K_RIGHT:
+                self.seek(self.frame + SEEK_FRAMES)
+            elif event.key == pygame.K_LEFT:
+                self.seek(self.frame - SEEK_FRAMES)
+            elif event.key == pygame.K_UP:
+                self.speed *= 2
+            elif event.key == pygame.K_DOWN:
+                self.speed /= 2
+            elif event.key == pygame.K_HOME:
+                self.seek(0)
+        return True
+
+    def play(self, start=0):
+        """
+        Play from frame start until the window is closed.
+        """
+        if not len(self.trajectory):
+            return
+        self.seek(start)
+        running = True
+        while running:
+            for event in pygame.event.get():
+                running = self.handle(event) and running
+            self.viewer.draw()
+            self.viewer.clock.tick(self.viewer.fps)
+            if not self.paused:
+                # Step through every frame in between so the tails stay right
+                self.position = min(self.position + self.speed, len(self.trajectory) - 1)
+                while self.frame < int(self.position):
+                    self.seek(self.frame + 1)
+        self.viewer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded trajectory file.")
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=1.0, help="Recorded frames per displayed frame")
+    parser.add_argument('--start', type=int, default=0, help="Frame to start from")
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--export', help="Write the frames to a .gif, a video or a directory of PNG frames, no window")
+    args = parser.parse_args(argv)
+
+    if args.export:
+        from .export import export_trajectory
+        summary = export_trajectory(args.path, args.export, max(1, round(args.speed)), args.fps, args.start)
+        print(f"{summary['frames']} frames exported to {args.export}")
+        return
+
+    replay = Replay(args.path, args.speed, args.fps)
+    replay.play(args.start)
+
+
+if __name__ == '__main__':
+    main()
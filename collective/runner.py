@@ -0,0 +1,226 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from .checkpoint import Checkpointer, load
+from .flock import Flock, place_birds, HEIGHT, WIDTH
+from .integrator import AdaptiveIntegrator
+from .metrics import Metrics
+from .parallel import ParallelFlock
+from .profiler import Profiler
+from .trajectory import Recorder
+
+FIELDS = ('x', 'y', 'angle', 'speed')
+
+
+def snapshot(flock):
+    # Current state as an (n, 4) array of x, y, angle, speed
+    return np.stack([flock.x, flock.y, flock.angle, flock.speed], axis=1)
+
+
+def stream(flock, steps=None, every=1, consumers=(), workers=None, integrator=None):
+    """
+    Advance the flock as fast as the CPU allows and yield its state.
+
+    Parameters:
+    - flock (Flock): Flock to advance in place.
+    - steps (int): Number of steps, None to run until a consumer stops it.
+    - every (int): Yield the state every this many steps.
+    - consumers (list): Callables consumer(step, flock) called after each step,
+      returning False stops the run.
+    - workers (int): Update partitions of the flock on this many processes.
+    - integrator (AdaptiveIntegrator): Advance the flock with this integrator instead.
+
+    Yields:
+    tuple: Step number and an (n, 4) array of x, y, angle, speed.
+    """
+    if integrator is not None and workers and workers > 1:
+        raise ValueError("The adaptive integrator runs on a single process")
+    if integrator is not None:
+        stepper = integrator
+    else:
+        stepper = ParallelFlock(flock, workers) if workers and workers > 1 else flock
+    try:
+        step = 0
+        while steps is None or step < steps:
+            stepper.step()
+            step += 1
+            running = True
+            for consumer in consumers:
+                if consumer(step, flock) is False:
+                    running = False
+            if step % every == 0:
+                yield step, snapshot(flock)
+            if not running:
+                break
+    finally:
+        if isinstance(stepper, ParallelFlock):
+            stepper.close()
+
+
+def run(flock, steps, every=1, consumers=(), workers=None, integrator=None):
+    """
+    Run the flock headless for a number of steps.
+
+    Returns:
+    numpy.ndarray: Trajectories of shape (frames, n, 4) with x, y, angle, speed.
+    """
+    frames = [state for _, state in stream(flock, steps, every, consumers, workers, integrator)]
+    if not frames:
+        return np.empty((0, flock.n, len(FIELDS)))
+    return np.stack(frames)
+
+
+class Throttle:
+    """
+    Call a consumer at most fps times per second of wall-clock time,
+    without slowing down the simulation in between.
+    """
+
+    def __init__(self, consumer, fps):
+        self.consumer = consumer
+        self.interval = 1 / fps
+        self.last = None
+
+    def __call__(self, step, flock):
+        now = time.perf_counter()
+        if self.last is not None and now - self.last < self.interval:
+            return True
+        self.last = now
+        return self.consumer(step, flock)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the flock without a window.")
+    parser.add_argument('--steps', type=int, default=10000)
+    parser.add_argument('--birds', type=int, default=50)
+    parser.add_argument('--radius', type=float, default=1000)
+    parser.add_argument('--width', type=int, default=WIDTH, help="World width")
+    parser.add_argument('--height', type=int, default=HEIGHT, help="World height")
+    parser.add_argument('--margin', type=float, default=125, help="Half side of the starting box")
+    parser.add_argument('--neighbors', choices=['all', 'grid'], default='all',
+                        help="Interact with all birds or only those in perception range")
+    parser.add_argument('--interaction', choices=['distance', 'vision'], default='distance',
+                        help="Distance-based rules or the vision-based model")
+    parser.add_argument('--occlusion', action='store_true',
+                        help="Only interact with the birds in vision, not hidden behind closer ones")
+    parser.add_argument('--theta', type=float,
+                        help="Sum the far birds by groups under this opening angle, Barnes-Hut style (see quadtree.py)")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Move birds one after the other like the original main loop")
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64',
+                        help="Precision of the state, float32 halves its memory (see benchmark.py --precision)")
+    parser.add_argument('--tails', choices=['float', 'uint16', 'none'], default='float',
+                        help="Keep the tails in the state precision, quantized to uint16 or not at all")
+    parser.add_argument('--workers', type=int, help="Update the flock on this many processes")
+    parser.add_argument('--predators', type=int, default=0, help="Make the last this many birds predators")
+    parser.add_argument('--predator', dest='predators', action='store_const', const=1,
+                        help="Make the last bird a predator")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Sub-step birds whose speed or heading changes fast (see integrator.py)")
+    parser.add_argument('--max-turn', type=float, default=0.05, help="Largest heading change of a sub-step in radians")
+    parser.add_argument('--max-dv', type=float, default=0.1, help="Largest speed change of a sub-step")
+    parser.add_argument('--max-level', type=int, default=4, help="Split a step into at most 2**max_level sub-steps")
+    parser.add_argument('--every', type=int, default=1, help="Record every this many steps")
+    parser.add_argument('--out', help="Save trajectories to this .npy file")
+    parser.add_argument('--record', help="Record the run to this trajectory file (see replay.py)")
+    parser.add_argument('--export', help="Draw the run offscreen to a .gif, a video or a directory of PNG frames")
+    parser.add_argument('--export-fps', type=int, default=30, help="Frames per second of the exported animation")
+    parser.add_argument('--serve', nargs='?', const='127.0.0.1:8765', metavar='HOST:PORT',
+                        help="Publish the frames to clients on the network (see client.py), 127.0.0.1:8765 by default")
+    parser.add_argument('--serve-fps', type=float, help="Publish at most this many frames per second")
+    parser.add_argument('--metrics', action='store_true', help="Print a summary of the order metrics")
+    parser.add_argument('--profile', action='store_true', help="Print the time spent per phase of a step")
+    parser.add_argument('--seed', type=int, help="Seed of the starting positions and headings")
+    parser.add_argument('--checkpoint', help="Save checkpoints to this file, {step} in the name keeps all of them")
+    parser.add_argument('--checkpoint-every', type=int, default=1000, help="Save a checkpoint every this many steps")
+    parser.add_argument('--resume', help="Continue from this checkpoint instead of starting a new flock")
+    args = parser.parse_args(argv)
+
+    step = 0
+    if args.resume:
+        flock, step, _ = load(args.resume)
+    else:
+        random.seed(args.seed)
+        xs, ys = place_birds(args.birds, args.margin, args.width, args.height)
+        flock = Flock(xs, ys, radius=args.radius, width=args.width, height=args.height, neighbors=args.neighbors,
+                      interaction=args.interaction, sequential=args.sequential, occlusion=args.occlusion,
+                      theta=args.theta, dtype=args.dtype, tails=None if args.tails == 'none' else args.tails)
+        if args.predators:
+            flock.predator[-args.predators:] = True
+
+    metrics = Metrics()
+    if args.metrics:
+        flock.attach(metrics)
+    profiler = Profiler()
+    if args.profile:
+        flock.profile(profiler)
+
+    integrator = None
+    if args.adaptive:
+        integrator = AdaptiveIntegrator(flock, args.max_turn, args.max_dv, args.max_level)
+
+    consumers = []
+    if args.record:
+        recorder = Recorder(args.record, flock, args.every)
+        consumers.append(recorder)
+    if args.checkpoint:
+        consumers.append(Checkpointer(args.checkpoint, args.checkpoint_every, start=step))
+    exporter = None
+    if args.export:
+        # Loads pygame, only when exporting
+        from .export import Exporter
+        exporter = Exporter(args.export, flock, args.every, args.export_fps)
+        consumers.append(exporter)
+    server = None
+    if args.serve:
+        from .server import Server
+        host, _, port = args.serve.rpartition(':')
+        server = Server(flock, host or '127.0.0.1', int(port), args.every)
+        print(f"serving on {server.host}:{server.port}")
+        consumers.append(Throttle(server, args.serve_fps) if args.serve_fps else server)
+
+    start = time.perf_counter()
+    try:
+        if args.out:
+            np.save(args.out, run(flock, args.steps, args.every, consumers, args.workers, integrator))
+        else:
+            # Nothing to keep in memory, the recorder writes the frames out as they come
+            for _ in stream(flock, args.steps, args.steps, consumers, args.workers, integrator):
+                pass
+    finally:
+        if args.record:
+            recorder.close()
+        if exporter is not None:
+            exporter.close()
+        if server is not None:
+            server.close()
+    elapsed = time.perf_counter() - start
+    print(f"{args.steps} steps of {flock.n} birds in {elapsed:.2f} s ({args.steps / elapsed:.0f} steps/s)")
+    if args.metrics:
+        for name, value in metrics.summary().items():
+            print(f"{name}: {value:.4f}")
+    if flock.theta is not None:
+        error = flock.approximation_error()
+        print(f"Barnes-Hut sums with theta {flock.theta} against the exact ones over {error['birds']} birds, "
+              f"error relative to the RMS of the exact sums: dspeed RMS {error['dspeed_error']:.2e} "
+              f"(max {error['dspeed_error_max']:.2e}), "
+              f"dangle RMS {error['dangle_error']:.2e} (max {error['dangle_error_max']:.2e})")
+    if exporter is not None:
+        summary = exporter.summary()
+        print(f"{summary['frames']} frames exported to {args.export}, "
+              f"{summary['waited']:.2f} s of the run spent waiting for the encoders")
+    if server is not None:
+        summary = server.summary()
+        print(f"{summary['published']} frames encoded, {summary['frames']} sent to {summary['clients']} clients "
+              f"({summary['bytes'] / 1024:.0f} KiB), {summary['dropped']} dropped for slow clients")
+    if args.adaptive:
+        print(integrator.report())
+    if args.profile:
+        print(profiler.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .trajectory import header_bytes
+
+MAGIC = b'FLOCKSTR'
+VERSION = 1
+KEYFRAME_EVERY = 30 # Frames from one keyframe to the next, delta frames are decoded against the last keyframe
+QUEUE_FRAMES = 4 # Frames waiting for a client at most, the oldest delta frames are dropped beyond
+SEND_BUFFER = 2 ** 14 # Bytes in the kernel send buffer of a connection, kept small so slow clients lag little
+HOST, PORT = '127.0.0.1', 8765
+KEY, DELTA = 0, 1 # Kinds of frames
+FRAME = struct.Struct('<BIId') # Frame prefix: kind, step, step of its keyframe, send time in seconds since the epoch
+LENGTH = struct.Struct('<I') # Length of every message of the plain TCP protocol
+LEVELS = 2 ** 16 # Quantization steps of the positions over the world and of the angles over a turn
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC11B85'
+
+
+def quantize(x, y, angle, speed, width, height):
+    """
+    Positions and angles as uint16 steps around the world and the turn,
+    and the bits of the speeds as float16, which can be negative or above
+    the largest speed of the flock.
+
+    Returns:
+    numpy.ndarray: Array of shape (4, n) of uint16 with x, y, angle and speed.
+    """
+    turns = np.stack([np.asarray(x) / width, np.asarray(y) / height, np.asarray(angle) / (2 * np.pi)])
+    # Both edges of the world, or of a turn, are the same step
+    steps = (np.round(turns * LEVELS).astype(np.int64) % LEVELS).astype(np.uint16)
+    return np.vstack([steps, np.asarray(speed).astype(np.float16).view(np.uint16)])
+
+
+def dequantize(state, width, height):
+    # Inverse of quantize, as float arrays x, y, angle, speed
+    turns = state[:3] / LEVELS
+    return turns[0] * width, turns[1] * height, turns[2] * 2 * np.pi, state[3].view(np.float16).astype(float)
+
+
+def shuffle(state):
+    # Low bytes of all values, then their high bytes: deltas are mostly small so the high bytes are runs
+    # of 0 and 255 that compress well
+    return np.ascontiguousarray(state.view(np.uint8).reshape(4, -1, 2).transpose(2, 0, 1)).tobytes()
+
+
+def unshuffle(data, n):
+    # Inverse of shuffle
+    values = np.frombuffer(data, dtype=np.uint8).reshape(2, 4, n)
+    return np.ascontiguousarray(values.transpose(1, 2, 0)).view(np.uint16)[..., 0]
+
+
+class FrameEncoder:
+    """
+    Compact binary frames of the state of a flock.
+
+    A keyframe holds the quantized positions, angles and speeds (see
+    quantize) and the packed predator flags, 8 bytes and a bit per bird.
+    The frames in between are deltas against the last keyframe, the
+    wrapped-around differences of the quantized values, compressed with
+    zlib. Every frame starts with FRAME: its kind, its step, the step of
+    its keyframe and the time it was encoded.
+    """
+
+    def __init__(self, flock, keyframe_every=KEYFRAME_EVERY):
+        self.n = flock.n
+        self.width = flock.width
+        self.height = flock.height
+        self.keyframe_every = keyframe_every
+        self.key = None # Quantized state of the last keyframe
+        self.key_step = 0
+        self.count = 0 # Frames since the last keyframe
+
+    def header(self):
+        # First message to every client, with what its decoder needs
+        document = {'n': self.n, 'width': self.width, 'height': self.height, 'keyframe_every': self.keyframe_every}
+        return header_bytes(document, MAGIC, VERSION)
+
+    def keyframe_due(self):
+        return self.key is None or self.count >= self.keyframe_every
+
+    def skip(self):
+        # Count a frame that is not encoded, nobody is listening
+        self.count += 1
+
+    def encode(self, step, flock):
+        """
+        Returns:
+        tuple: Kind of the frame, KEY or DELTA, and the frame.
+        """
+        state = quantize(flock.x, flock.y, flock.angle, flock.speed, self.width, self.height)
+        flags = np.packbits(flock.predator).tobytes()
+        if self.keyframe_due():
+            self.key, self.key_step, self.count = state, step, 1
+            return KEY, FRAME.pack(KEY, step, step, time.time()) + state.tobytes() + flags
+        self.count += 1
+        # uint16 differences wrap around, like the positions and angles themselves
+        body = zlib.compress(shuffle(state - self.key), 1) + flags
+        return DELTA, FRAME.pack(DELTA, step, self.key_step, time.time()) + body
+
+
+def read_stream_header(message):
+    """
+    Read the first message of a stream, written by FrameEncoder.header.
+
+    Returns:
+    dict: The header document.
+    """
+    if message[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a flock stream")
+    found, length = np.frombuffer(message[len(MAGIC):len(MAGIC) + 8], dtype='<u4')
+    if found != VERSION:
+        raise ValueError(f"Unsupported stream version {found}")
+    return json.loads(message[len(MAGIC) + 8:len(MAGIC) + 8 + int(length)])
+
+
+class FrameDecoder:
+    """
+    Decodes the frames of a stream in order, see FrameEncoder.
+    """
+
+    def __init__(self, header):
+        self.n = header['n']
+        self.width = header['width']
+        self.height = header['height']
+        self.key = None
+        self.key_step = None
+
+    def decode(self, message):
+        """
+        Returns:
+        tuple: Kind, step, send time, and the state as float arrays x, y,
+        angle, speed and a bool array of the predators. None for a delta
+        frame whose keyframe was never received.
+        """
+        n = self.n
+        kind, step, key_step, sent = FRAME.unpack_from(message)
+        body = message[FRAME.size:]
+        flag_bytes = (n + 7) // 8
+        flags = np.unpackbits(np.frombuffer(body[len(body) - flag_bytes:], dtype=np.uint8), count=n).astype(bool)
+        if kind == KEY:
+            state = np.frombuffer(body, dtype=np.uint16, count=4 * n).reshape(4, n)
+            self.key, self.key_step = state, step
+        elif key_step != self.key_step:
+            return None
+        else:
+            state = unshuffle(zlib.decompress(body[:len(body) - flag_bytes]), n) + self.key
+        return (kind, step, sent) + dequantize(state, self.width, self.height) + (flags,)
+
+
+class Mailbox:
+    """
+    Frames waiting for a reader, thread-safe.
+
+    A keyframe replaces every frame before it. Beyond size frames the
+    oldest delta frame is dropped, never a keyframe the delta frames after
+    it depend on.
+    """
+
+    def __init__(self, size=QUEUE_FRAMES):
+        self.size = size
+        self.frames = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def push(self, kind, message):
+        with self.lock:
+            if kind == KEY:
+                self.dropped += len(self.frames)
+                self.frames = [(kind, message)]
+                return
+            if len(self.frames) >= self.size:
+                self.dropped += 1
+                if self.frames[0][0] != KEY:
+                    del self.frames[0]
+                elif len(self.frames) > 1:
+                    del self.frames[1]
+                else:
+                    # Only the keyframe waiting, the new frame goes
+                    return
+            self.frames.append((kind, message))
+
+    def take(self):
+        with self.lock:
+            frames, self.frames = self.frames, []
+        return frames
+
+
+def websocket_frame(message):
+    # Unmasked binary WebSocket frame, as sent by a server
+    length = len(message)
+    if length < 126:
+        prefix = struct.pack('!BB', 0x82, length)
+    elif length < 2 ** 16:
+        prefix = struct.pack('!BBH', 0x82, 126, length)
+    else:
+        prefix = struct.pack('!BBQ', 0x82, 127, length)
+    return prefix + message
+
+
+def websocket_accept(key):
+    # Sec-WebSocket-Accept answering a Sec-WebSocket-Key
+    return base64.b64encode(hashlib.sha1(key.strip() + WEBSOCKET_GUID).digest())
+
+
+class Client:
+    """
+    Connection of a client to a Server, with its own mailbox.
+    """
+
+    def __init__(self, writer, websocket, queue_frames):
+        self.writer = writer
+        self.websocket = websocket
+        self.mailbox = Mailbox(queue_frames)
+        self.ready = asyncio.Event()
+        self.frames = 0
+        self.bytes = 0
+
+    def write(self, message):
+        data = websocket_frame(message) if self.websocket else LENGTH.pack(len(message)) + message
+        self.writer.write(data)
+        self.bytes += len(data)
+
+    async def send(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            for _, message in self.mailbox.take():
+                self.write(message)
+                self.frames += 1
+                # Only this client waits for its socket, frames for it pile up in its mailbox meanwhile
+                await self.writer.drain()
+
+
+class Server:
+    """
+    Consumer (see runner.stream) publishing the state of the flock to
+    clients on the network, see FrameEncoder for the frames.
+
+    The server runs an asyncio loop on its own thread. Clients connect over
+    TCP and send MAGIC, then receive the stream header and the frames, each
+    prefixed with its length as LENGTH, or connect as WebSocket clients and
+    receive every message as one binary WebSocket message.
+
+    The simulation thread encodes every frame and leaves it in a mailbox
+    for the loop, which passes it on to the mailboxes of the clients (see
+    Mailbox). Each client is written to as fast as it reads, and a client
+    falling behind loses the delta frames it had no time for, so the
+    simulation never waits for the network. Frames are only encoded while
+    clients are connected, apart from the keyframes new clients start with.
+    """
+
+    def __init__(self, flock, host=HOST, port=PORT, every=1, keyframe_every=KEYFRAME_EVERY,
+                 queue_frames=QUEUE_FRAMES):
+        self.encoder = FrameEncoder(flock, keyframe_every)
+        self.header = self.encoder.header()
+        self.every = every
+        self.queue_frames = queue_frames
+        self.inbox = Mailbox(queue_frames)
+        self.clients = set()
+        self.last_key = None
+        self.scheduled = False
+        self.published = 0
+        self.served = {'clients': 0, 'frames': 0, 'bytes': 0, 'dropped': 0}
+
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.error = None
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self.serve, args=(host, port), daemon=True)
+        self.thread.start()
+        self.started.wait()
+        if self.error is not None:
+            raise self.error
+        self.host, self.port = self.server.sockets[0].getsockname()[:2]
+
+    def serve(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.connect, host, port))
+        except OSError as error:
+            self.error = error
+            self.started.set()
+            return
+        self.started.set()
+        self.loop.run_forever()
+
+    def __call__(self, step, flock):
+        if step % self.every:
+            return True
+        if not self.clients and not self.encoder.keyframe_due():
+            self.encoder.skip()
+            return True
+        kind, message = self.encoder.encode(step, flock)
+        self.inbox.push(kind, message)
+        self.published += 1
+        if not self.scheduled:
+            self.scheduled = True
+            self.loop.call_soon_threadsafe(self.distribute)
+        return True
+
+    def distribute(self):
+        # On the loop: hand the new frames to every client
+        self.scheduled = False
+        for kind, message in self.inbox.take():
+            if kind == KEY:
+                self.last_key = message
+            for client in self.clients:
+                client.mailbox.push(kind, message)
+                client.ready.set()
+
+    async def connect(self, reader, writer):
+        client = None
+        try:
+            start = await reader.readexactly(4)
+            websocket = start == b'GET '
+            if websocket:
+                request = start + await reader.readuntil(b'\r\n\r\n')
+                key = next((line.split(b':', 1)[1] for line in request.split(b'\r\n')
+                            if line.lower().startswith(b'sec-websocket-key:')), None)
+                if key is None:
+                    return
+                writer.write(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                             b'Sec-WebSocket-Accept: ' + websocket_accept(key) + b'\r\n\r\n')
+            elif start + await reader.readexactly(len(MAGIC) - 4) != MAGIC:
+                return
+
+            # Frames wait in the mailbox, where they can be dropped, rather than in buffers
+            writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+            writer.transport.set_write_buffer_limits(high=0)
+            client = Client(writer, websocket, self.queue_frames)
+            client.write(self.header)
+            if self.last_key is not None:
+                client.mailbox.push(KEY, self.last_key)
+                client.ready.set()
+            self.clients.add(client)
+            # Until the client hangs up, anything it sends is ignored
+            sending = asyncio.ensure_future(client.send())
+            listening = asyncio.ensure_future(self.listen(reader))
+            await asyncio.wait([sending, listening], return_when=asyncio.FIRST_COMPLETED)
+            for task in (sending, listening):
+                task.cancel()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            if client is not None:
+                self.leave(client)
+            writer.close()
+
+    def leave(self, client):
+        # Count what a client got once it is gone
+        if client in self.clients:
+            self.clients.discard(client)
+            self.served['clients'] += 1
+            self.served['frames'] += client.frames
+            self.served['bytes'] += client.bytes
+            self.served['dropped'] += client.mailbox.dropped
+
+    async def listen(self, reader):
+        while await reader.read(4096):
+            pass
+
+    async def shutdown(self):
+        self.server.close()
+        for client in list(self.clients):
+            self.leave(client)
+            client.writer.close()
+        # Let the connections finish
+        await asyncio.sleep(0)
+
+    def close(self):
+        if self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def summary(self):
+        """
+        Returns:
+        dict: Frames encoded, clients served, frames and bytes sent to
+        them and frames dropped, for a client or before reaching any.
+        """
+        return dict(self.served, published=self.published, dropped=self.served['dropped'] + self.inbox.dropped)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+def minimum_image(d, size):
+    # Shortest signed difference along one axis of the wrap-around world
+    return d - size * np.round(d / size)
+
+
+def axis_cells(v, size, cell_size, cells):
+    # Cell along one axis of every position, (v % size // cell_size) % cells without the slow float
+    # modulo for positions already inside the world, like the flock keeps them
+    v = np.asarray(v)
+    if v.size and (v.min() < 0 or v.max() >= size):
+        v = v % size
+    cell = (v // cell_size).astype(int)
+    # Only a position rounded up to the far edge can land one cell past the last
+    return np.where(cell == cells, 0, cell)
+
+
+class CellList:
+    """
+    Uniform grid over the wrap-around world for radius queries.
+
+    Points are sorted by cell once per build(), after which neighbors() answers
+    the radius query of a whole batch of points by only looking at the cells
+    around each of them. Distances use the minimum-image convention, or plain
+    differences with periodic=False.
+    """
+
+    def __init__(self, width, height, cell_size, periodic=True):
+        # At least one cell, cells at least cell_size wide so neighbours are at most one cell away
+        self.width = width
+        self.height = height
+        self.nx = max(1, int(width // cell_size))
+        self.ny = max(1, int(height // cell_size))
+        self.cell_width = width / self.nx
+        self.cell_height = height / self.ny
+        self.periodic = periodic
+        # Neighbouring cell offsets, without repeats when the grid is narrower than three cells
+        if periodic:
+            self.offsets_x = np.unique(np.arange(-1, 2) % self.nx)
+            self.offsets_y = np.unique(np.arange(-1, 2) % self.ny)
+        else:
+            self.offsets_x = self.offsets_y = np.arange(-1, 2)
+        self.x = self.y = None
+
+    def cells(self, x, y):
+        return axis_cells(x, self.width, self.cell_width, self.nx), axis_cells(y, self.height, self.cell_height, self.ny)
+
+    def build(self, x, y):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        cx, cy = self.cells(self.x, self.y)
+        cell = cy * self.nx + cx
+        # Same order, 16-bit keys are radix sorted
+        self.order = np.argsort(cell.astype(np.uint16) if self.nx * self.ny <= 2 ** 16 else cell, kind='stable')
+        counts = np.bincount(cell, minlength=self.nx * self.ny)
+        self.starts = np.concatenate(([0], np.cumsum(counts)))
+        return self
+
+    def neighbors(self, qx, qy, radius, exclude=None):
+        """
+        Find all indexed points within radius of each query point.
+
+        Parameters:
+        - qx, qy (array): Query positions.
+        - radius (float): Query radius, at most the cell size.
+        - exclude (array): Index of a point to skip for each query, usually the query itself.
+
+        Returns:
+        tuple: Arrays query index, point index, dx, dy and distance of every pair,
+        with (dx, dy) the vector from the query to the point.
+        """
+        qx = np.asarray(qx, dtype=float)
+        qy = np.asarray(qy, dtype=float)
+        cx, cy = self.cells(qx, qy)
+        queries, points = [], []
+        for ox in self.offsets_x:
+            for oy in self.offsets_y:
+                ncx, ncy = (cx + ox) % self.nx, (cy + oy) % self.ny
+                cell = ncy * self.nx + ncx
+                start = self.starts[cell]
+                count = self.starts[cell + 1] - start
+                if not self.periodic:
+                    # No cells beyond the edges of the world
+                    count = np.where((ncx == cx + ox) & (ncy == cy + oy), count, 0)
+                query = np.repeat(np.arange(len(qx)), count)
+                # Position of every expanded pair inside its cell's run of the sorted points
+                offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+                queries.append(query)
+                points.append(self.order[np.repeat(start, count) + offset])
+        query = np.concatenate(queries)
+        point = np.concatenate(points)
+
+        dx = self.x[point] - qx[query]
+        dy = self.y[point] - qy[query]
+        if self.periodic:
+            dx, dy = minimum_image(dx, self.width), minimum_image(dy, self.height)
+        dist = np.hypot(dx, dy)
+        keep = dist < radius
+        if exclude is not None:
+            keep &= point != np.asarray(exclude)[query]
+        return query[keep], point[keep], dx[keep], dy[keep], dist[keep]
+
+
+    def counts(self):
+        # Number of points per cell, rows along y
+        return np.diff(self.starts).reshape(self.ny, self.nx)
+
+    def span(self, low, high, size, cells):
+        # Cells along one axis overlapping low..high, wrapped around the world or clipped to it
+        first, last = int(np.floor(low / size)), int(np.floor(high / size))
+        if self.periodic:
+            return np.unique(np.arange(first, min(last, first + cells - 1) + 1) % cells)
+        return np.arange(max(first, 0), min(last, cells - 1) + 1)
+
+    def in_rect(self, x0, y0, x1, y1):
+        """
+        Indexed points in the cells overlapping a rectangle, a superset of the points inside it.
+
+        Parameters:
+        - x0, y0, x1, y1 (float): Corners of the rectangle, past the edges of a periodic world it wraps around.
+
+        Returns:
+        numpy.ndarray: Point indices, cell by cell.
+        """
+        cx = self.span(x0, x1, self.cell_width, self.nx)
+        cy = self.span(y0, y1, self.cell_height, self.ny)
+        cell = (cy[:, None] * self.nx + cx[None, :]).ravel()
+        start = self.starts[cell]
+        count = self.starts[cell + 1] - start
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return self.order[np.repeat(start, count) + offset]
@@ -0,0 +1,215 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .flock import Flock, place_birds, ALPHA_0, BETA_0, ALPHA_1, BETA_1, MAX_SPEED
+from .ensemble import Ensemble
+from .metrics import Metrics
+
+# Parameters a sweep can vary and their defaults
+DEFAULTS = {
+    'alpha_0': ALPHA_0,
+    'beta_0': BETA_0,
+    'alpha_1': ALPHA_1,
+    'beta_1': BETA_1,
+    'max_speed': MAX_SPEED,
+    'num_birds': 50,
+    'radius': 1000,
+}
+INTEGER_PARAMETERS = ('num_birds',)
+SETTINGS = ('steps', 'neighbors', 'interaction') # Run settings stored in every row, part of the resume key
+
+
+def grid(space):
+    """
+    Every combination of the parameter values.
+
+    Parameters:
+    - space (dict): Parameter name to list of values.
+
+    Returns:
+    list: One dict of parameter values per cell.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_samples(ranges, count, seed=0):
+    # Uniform samples from the (low, high) range of every parameter
+    rng = np.random.default_rng(seed)
+    return [cast({name: rng.uniform(low, high) for name, (low, high) in ranges.items()}) for _ in range(count)]
+
+
+def latin_hypercube(ranges, count, seed=0):
+    # Samples with exactly one sample in each of the count strata of every parameter
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for name, (low, high) in ranges.items():
+        strata = (rng.permutation(count) + rng.uniform(size=count)) / count
+        columns[name] = low + strata * (high - low)
+    return [cast({name: columns[name][i] for name in ranges}) for i in range(count)]
+
+
+def cast(cell):
+    # Round integer parameters and turn numpy scalars into plain numbers
+    return {name: int(round(value)) if name in INTEGER_PARAMETERS else float(value) for name, value in cell.items()}
+
+
+def run_cell(cell, seed, steps, options):
+    """
+    Run one headless simulation of a parameter cell.
+
+    Returns:
+    dict: The cell, the seed and the summary of the metrics over the run.
+    """
+    values = {**DEFAULTS, **cell}
+    random.seed(seed)
+    xs, ys = place_birds(values['num_birds'])
+    coefficients = {name: values[name] for name in ('alpha_0', 'beta_0', 'alpha_1', 'beta_1', 'max_speed', 'radius')}
+    flock = Flock(xs, ys, **coefficients, **options)
+    metrics = Metrics()
+    flock.attach(metrics)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        flock.step()
+    settings = {'steps': steps, 'neighbors': flock.neighbors, 'interaction': flock.interaction}
+    return {**cell, 'seed': seed, **settings, **metrics.summary(), 'seconds': time.perf_counter() - start}
+
+
+def run_ensemble(cell, seeds, steps):
+    """
+    Run all seeds of a parameter cell together as the replicas of an Ensemble.
+
+    Returns:
+    list: One dict per seed, as run_cell, with the time per replica.
+    """
+    values = {**DEFAULTS, **cell}
+    coefficients = {name: values[name] for name in ('alpha_0', 'beta_0', 'alpha_1', 'beta_1', 'max_speed', 'radius')}
+    ensemble = Ensemble(len(seeds), values['num_birds'], seeds, **coefficients)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        ensemble.step()
+    seconds = (time.perf_counter() - start) / len(seeds)
+    settings = {'steps': steps, 'neighbors': 'all', 'interaction': 'distance'}
+    return [{**cell, 'seed': row.pop('seed'), **settings, **row, 'seconds': seconds} for row in ensemble.summary()]
+
+
+def completed(path, names):
+    # Keys of the runs already in the result file, the cell, the settings and the seed
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        missing = [name for name in SETTINGS if name not in (reader.fieldnames or SETTINGS)]
+        if missing:
+            raise ValueError(f"{path} has no {', '.join(missing)} columns, its runs cannot be told apart: "
+                             f"write the sweep to a new file")
+        return {tuple(row[name] for name in (*names, *SETTINGS, 'seed')) for row in reader}
+
+
+def sweep(cells, seeds, steps, path, workers=None, options=None, ensemble=False):
+    """
+    Run every cell with every seed on a process pool and append the results to a CSV file.
+
+    Runs already in the file with the same cell, seed, steps and model
+    options are skipped, so an interrupted sweep resumes where it stopped
+    when started again with the same arguments; a file written before the
+    settings were stored is refused. With ensemble=True the seeds of a cell
+    run together as one Ensemble, which only supports the default
+    all-pairs, distance-based model.
+
+    Returns:
+    int: Number of runs done by this call.
+    """
+    options = {'neighbors': 'all', 'interaction': 'distance', **(options or {})}
+    names = list(cells[0]) if cells else []
+    done = completed(path, names)
+    settings = (str(steps), options['neighbors'], options['interaction'])
+    todo = [(cell, seed) for cell in cells for seed in seeds
+            if tuple(str(cell[name]) for name in names) + settings + (str(seed),) not in done]
+
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as f, ProcessPoolExecutor(workers) as pool:
+        writer = None
+        if ensemble:
+            # The seeds still to run of every cell, in one task per cell
+            groups = {}
+            for cell, seed in todo:
+                groups.setdefault(id(cell), (cell, []))[1].append(seed)
+            futures = [pool.submit(run_ensemble, cell, cell_seeds, steps) for cell, cell_seeds in groups.values()]
+        else:
+            futures = [pool.submit(run_cell, cell, seed, steps, options) for cell, seed in todo]
+        count = 0
+        for future in as_completed(futures):
+            rows = future.result()
+            for row in rows if ensemble else [rows]:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    if new_file:
+                        writer.writeheader()
+                writer.writerow(row)
+                count += 1
+                print(f"{count}/{len(todo)} {row}")
+            f.flush()
+    return len(todo)
+
+
+def parse_values(text):
+    # "name=1,2,3" to (name, [1.0, 2.0, 3.0])
+    name, values = text.split('=')
+    if name not in DEFAULTS:
+        raise argparse.ArgumentTypeError(f"Unknown parameter: {name}")
+    return name, [float(value) for value in values.split(',')]
+
+
+def parse_range(text):
+    # "name=low:high" to (name, (low, high))
+    name, bounds = text.split('=')
+    if name not in DEFAULTS:
+        raise argparse.ArgumentTypeError(f"Unknown parameter: {name}")
+    low, high = bounds.split(':')
+    return name, (float(low), float(high))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep the model parameters headless on a process pool.")
+    parser.add_argument('--grid', nargs='+', type=parse_values, default=[],
+                        help="Values per parameter, e.g. alpha_0=0.1,0.2 num_birds=50,100")
+    parser.add_argument('--range', nargs='+', type=parse_range, default=[],
+                        help="Sampling range per parameter, e.g. beta_0=0.0005:0.01")
+    parser.add_argument('--samples', type=int, default=10, help="Number of sampled cells with --range")
+    parser.add_argument('--method', choices=['random', 'lhs'], default='lhs')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0])
+    parser.add_argument('--steps', type=int, default=1000)
+    parser.add_argument('--neighbors', choices=['all', 'grid'], default='all')
+    parser.add_argument('--interaction', choices=['distance', 'vision'], default='distance')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--ensemble', action='store_true',
+                        help="Run the seeds of every cell together in one vectorized ensemble")
+    parser.add_argument('--out', default='sweep.csv')
+    args = parser.parse_args(argv)
+
+    if args.grid:
+        cells = [cast(cell) for cell in grid(dict(args.grid))]
+    elif args.range:
+        sampler = latin_hypercube if args.method == 'lhs' else random_samples
+        cells = sampler(dict(args.range), args.samples)
+    else:
+        parser.error("Give the parameter values with --grid or --range")
+
+    if args.ensemble and (args.neighbors != 'all' or args.interaction != 'distance'):
+        parser.error("--ensemble only supports --neighbors all and --interaction distance")
+    options = {'neighbors': args.neighbors, 'interaction': args.interaction}
+    sweep(cells, args.seeds, args.steps, args.out, args.workers, options, args.ensemble)
+
+
+if __name__ == '__main__':
+    main()
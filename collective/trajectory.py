@@ -0,0 +1,126 @@
+import json
+import os
+
+import numpy as np
+
+MAGIC = b'FLOCKTRJ'
+VERSION = 1
+ALIGN = 64 # Frames start at a multiple of this many bytes
+
+
+def frame_dtype(n):
+    # One recorded step: x, y, angle and speed as float32 and the predator flags
+    return np.dtype([('x', '<f4', (n,)), ('y', '<f4', (n,)), ('angle', '<f4', (n,)),
+                     ('speed', '<f4', (n,)), ('predator', 'u1', (n,))])
+
+
+class Recorder:
+    """
+    Consumer (see runner.stream) appending the state of a flock to a trajectory file.
+
+    The file starts with a small header: the magic bytes, the format version,
+    the length of a JSON document and the document itself with the number of
+    birds, the world and the flock parameters, padded so the frames that
+    follow are aligned. Frames are buffered and written chunk by chunk; a file
+    cut short by an interruption is still readable up to its last whole frame.
+    """
+
+    def __init__(self, path, flock, every=1, chunk=256, meta=None):
+        self.path = path
+        self.every = every
+        self.dtype = frame_dtype(flock.n)
+        self.buffer = np.zeros(chunk, dtype=self.dtype)
+        self.count = 0
+
+        header = {'n': flock.n, 'every': every, 'params': flock.params(), 'meta': meta or {}}
+        self.file = open(path, 'wb')
+        self.file.write(header_bytes(header))
+
+    def __call__(self, step, flock):
+        if step % self.every:
+            return True
+        frame = self.buffer[self.count]
+        frame['x'], frame['y'], frame['angle'], frame['speed'] = flock.x, flock.y, flock.angle, flock.speed
+        frame['predator'] = flock.predator
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+        return True
+
+    def flush(self):
+        self.file.write(self.buffer[:self.count].tobytes())
+        self.file.flush()
+        self.count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def header_bytes(header, magic=MAGIC, version=VERSION):
+    # Magic bytes, format version, length of the JSON header and the header, padded to ALIGN bytes
+    document = json.dumps(header).encode()
+    prefix = magic + np.array([version, len(document)], dtype='<u4').tobytes() + document
+    return prefix + b'\0' * (-len(prefix) % ALIGN)
+
+
+def read_header(path, magic=MAGIC, version=VERSION, kind="trajectory"):
+    """
+    Read the header written by header_bytes.
+
+    Returns:
+    tuple: The header document and the byte offset of the data after it.
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError(f"{path} is not a {kind} file")
+        found, length = np.frombuffer(f.read(8), dtype='<u4')
+        if found != version:
+            raise ValueError(f"Unsupported {kind} version {found}")
+        header = json.loads(f.read(int(length)))
+    offset = len(magic) + 8 + int(length)
+    return header, offset + (-offset % ALIGN)
+
+
+class Trajectory:
+    """
+    Read-only memory-mapped view of a trajectory file.
+
+    frames is a structured array of shape (steps,) with the fields x, y,
+    angle, speed (n float32 each) and predator; slicing it only reads the
+    selected part of the file, e.g. trajectory.frames['x'][1000:2000, :50].
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.header, offset = read_header(path)
+        self.n = self.header['n']
+        self.params = self.header['params']
+        dtype = frame_dtype(self.n)
+        steps = (os.path.getsize(path) - offset) // dtype.itemsize
+        self.frames = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(steps,))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def window(self, start=0, stop=None, birds=slice(None)):
+        """
+        State of some birds over a window of frames.
+
+        Returns:
+        numpy.ndarray: Array of shape (frames, birds, 4) with x, y, angle, speed.
+        """
+        frames = self.frames[start:stop]
+        return np.stack([frames[field][:, birds] for field in ('x', 'y', 'angle', 'speed')], axis=-1)
+
+    def load(self, flock, index):
+        # Set the state of a flock with the same number of birds to a frame
+        frame = self.frames[index]
+        flock.x, flock.y, flock.angle, flock.speed = frame['x'], frame['y'], frame['angle'], frame['speed']
+        flock.predator[:] = frame['predator'].astype(bool)
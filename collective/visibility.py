@@ -0,0 +1,66 @@
+import numpy as np
+
+BLOCK_ELEMENTS = 2 ** 14 # (pair, obstacle) entries tested at once, small enough to stay in the CPU caches
+
+
+def visible_pairs(observer, dx, dy, dist, body_radius):
+    """
+    Which neighbours within perception range every bird sees.
+
+    A neighbour is hidden when a closer neighbour of the same observer covers
+    its whole angular silhouette, the 'cone' test of vision.visibility_matrix
+    with the birds within range as obstacles. The pairs of every observer
+    are sorted by distance, so a target is only tested against the
+    neighbours before it, half of them on average, and the nearest
+    neighbour is always seen.
+
+    Parameters:
+    - observer (numpy.ndarray): Bird index of the observer of every pair, all pairs of every observer.
+    - dx, dy, dist (numpy.ndarray): Vector and distance from the observer to the target.
+    - body_radius (float): Radius of the bodies.
+
+    Returns:
+    numpy.ndarray: True where the target is in vision of the observer.
+    """
+    visible = np.ones(len(observer), dtype=bool)
+    if not len(observer):
+        return visible
+    r = body_radius
+    order = np.lexsort((dist, observer))
+    bearing = np.arctan2(dy[order], dx[order])
+    dist = dist[order]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        half = np.where(dist > r, np.arcsin(np.minimum(r / dist, 1)), np.pi)
+
+    # Pairs of every observer as padded rows from the nearest, the padding never covers anything
+    _, group, counts = np.unique(observer[order], return_inverse=True, return_counts=True)
+    slot = np.arange(len(order)) - np.repeat(np.cumsum(counts) - counts, counts)
+    rows = {}
+    # Padding: an obstacle too narrow to cover anything, infinitely far away
+    for name, values, pad in (('bearing', bearing, 0.0), ('half', half, -4 * np.pi), ('dist', dist, np.inf)):
+        rows[name] = np.full((len(counts), counts.max()), pad)
+        rows[name][group, slot] = values
+
+    # Targets by slot, every block tested against the columns before its farthest slot
+    targets = np.argsort(slot, kind='stable')
+    targets = targets[slot[targets] > 0]
+    seen = np.ones(len(order), dtype=bool)
+    start = 0
+    while start < len(targets):
+        stop = min(len(targets), start + max(1, BLOCK_ELEMENTS // slot[targets[start]]))
+        stop = start + max(1, BLOCK_ELEMENTS // slot[targets[stop - 1]])
+        pairs = targets[start:stop]
+        g, width = group[pairs], slot[pairs[-1]]
+
+        # cover >= 0 where obstacle k covers the silhouette of target j, itself included at 0
+        gap = np.abs(bearing[pairs, None] - rows['bearing'][g, :width])
+        np.minimum(gap, 2 * np.pi - gap, out=gap)
+        cover = rows['half'][g, :width]
+        cover -= half[pairs, None]
+        cover -= gap
+        hides = cover >= 0
+        hides &= rows['dist'][g, :width] < dist[pairs, None]
+        seen[pairs] = ~hides.any(axis=1)
+        start = stop
+    visible[order] = seen
+    return visible
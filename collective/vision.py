@@ -0,0 +1,219 @@
+import math
+
+import numpy as np
+
+class Point:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+class Circle:
+    def __init__(self, center, radius):
+        self.center = center
+        self.radius = radius
+
+def distance(point1, point2):
+    return math.sqrt((point1.x - point2.x)**2 + (point1.y - point2.y)**2)
+
+# function to check if point is inside circle
+def is_inside(circle, point):
+    return distance(circle.center, point) <= circle.radius
+
+def sample_points(circle, samples=8):
+    # Points evenly spaced on the circle, the targets of the vision rays
+    points = []
+    for i in range(samples):
+        angle = (2 * math.pi / samples) * i
+        x = circle.center.x + circle.radius * math.cos(angle)
+        y = circle.center.y + circle.radius * math.sin(angle)
+        points.append(Point(x, y))
+    return points
+
+def circle_arrays(circles):
+    # Centers (N, 2) and radii (N,) of a list of circles
+    centers = np.array([[c.center.x, c.center.y] for c in circles], dtype=float).reshape(-1, 2)
+    radii = np.array([c.radius for c in circles], dtype=float)
+    return centers, radii
+
+def is_in_vision(circle1, circle2, circle3, mode='samples'):
+    """
+    Check if one object is in vision of other.
+
+    Parameters:
+    - circle1 (Circle): Object with a vision.
+    - circle2 (Circle): Target object.
+    - circle3 (Circle): Obstacle.
+    - mode (str): 'samples' casts rays to 8 points on circle2, 'cone' tests the whole silhouette.
+
+    Returns:
+    bool: True if circle2 is in vision of circle1.
+    """
+    centers, radii = circle_arrays([circle1, circle2, circle3])
+    return bool(visibility_matrix(centers, radii, mode)[0, 1])
+
+def segment_hits_circle(start, end, center, radius):
+    """
+    Check if segments intersect circles, broadcasting over all arguments.
+
+    Parameters:
+    - start, end (numpy.ndarray): Segment end points, shape (..., 2).
+    - center (numpy.ndarray): Circle centers, shape (..., 2).
+    - radius (numpy.ndarray): Circle radii, shape (...).
+
+    Returns:
+    numpy.ndarray: True where the segment passes through the circle.
+    """
+    segment = end - start
+    to_center = center - start
+    length2 = np.maximum((segment ** 2).sum(axis=-1), 1e-12)
+    t = np.clip((to_center * segment).sum(axis=-1) / length2, 0, 1)
+    closest = start + t[..., None] * segment
+    return ((center - closest) ** 2).sum(axis=-1) <= radius ** 2
+
+def half_widths(dist, radius):
+    # Half of the angle a circle occupies in the vision, the whole vision from inside it
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(dist > radius, np.arcsin(np.minimum(radius / dist, 1)), np.pi)
+
+def visibility_matrix(centers, radii, mode='cone', samples=8, chunk=None):
+    """
+    Check which circles are in vision of which, every other circle being an obstacle.
+
+    In 'samples' mode a target is visible if at least one of the rays to
+    samples points on its border does not pass through a single obstacle,
+    as the original ray marching did. In 'cone' mode a target is hidden if
+    a closer obstacle covers its whole angular silhouette.
+
+    Parameters:
+    - centers (numpy.ndarray): Circle centers, shape (N, 2).
+    - radii (numpy.ndarray): Circle radii, shape (N,).
+    - mode (str): 'cone' or 'samples'.
+    - samples (int): Number of rays per target in 'samples' mode.
+    - chunk (int): Observers processed at once, bounds memory to chunk * N * N.
+
+    Returns:
+    numpy.ndarray: Boolean (N, N) matrix, [i, j] True if circle j is in vision of circle i.
+    """
+    if mode not in ('cone', 'samples'):
+        raise ValueError(f"Unknown vision mode: {mode}")
+    centers = np.asarray(centers, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    n = len(centers)
+    if chunk is None:
+        chunk = max(1, 2 ** 22 // max(n * n, 1))
+
+    delta = centers[None, :, :] - centers[:, None, :]
+    dist = np.hypot(delta[..., 0], delta[..., 1])
+    bearing = np.arctan2(delta[..., 1], delta[..., 0])
+    width = half_widths(dist, radii[None, :])
+
+    visible = np.empty((n, n), dtype=bool)
+    angles = 2 * np.pi * np.arange(samples) / samples
+    offsets = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+    for start in range(0, n, chunk):
+        rows = np.arange(start, min(start + chunk, n))
+        gap = np.abs((bearing[rows, :, None] - bearing[rows, None, :] + np.pi) % (2 * np.pi) - np.pi)
+        if mode == 'cone':
+            # hidden[i, j, k]: obstacle k is closer than target j and its cone contains the cone of j
+            hidden = ((dist[rows, None, :] < dist[rows, :, None]) &
+                      (gap + width[rows, :, None] <= width[rows, None, :]))
+        else:
+            # Rays to the samples straddle the bearing of the target, so an obstacle blocking
+            # all of them covers that bearing; only such obstacles are tested ray by ray
+            candidate = ((gap <= width[rows, None, :]) &
+                         (dist[rows, None, :] - radii[None, None, :] < dist[rows, :, None] + radii[None, :, None]))
+            i, j, k = np.nonzero(candidate)
+            points = centers[j, None, :] + radii[j, None, None] * offsets[None, :, :]
+            blocked = segment_hits_circle(centers[rows[i], None, :], points, centers[k, None, :], radii[k, None])
+            hidden = np.zeros(candidate.shape, dtype=bool)
+            hidden[i, j, k] = blocked.all(axis=-1)
+        # The observer and the target are never obstacles
+        hidden[np.arange(len(rows)), :, rows] = False
+        hidden[:, np.arange(n), np.arange(n)] = False
+        visible[rows] = ~hidden.any(axis=-1)
+    np.fill_diagonal(visible, False)
+    return visible
+
+
+def draw_circles_and_line(circle1, circle2, circle3):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+
+    # Draw circle1
+    circle1_patch = plt.Circle((circle1.center.x, circle1.center.y), circle1.radius, color='blue', fill=False)
+    ax.add_patch(circle1_patch)
+
+    # Draw circle2
+    circle2_patch = plt.Circle((circle2.center.x, circle2.center.y), circle2.radius, color='green', fill=False)
+    ax.add_patch(circle2_patch)
+
+    # Draw circle3
+    circle3_patch = plt.Circle((circle3.center.x, circle3.center.y), circle3.radius, color='red', fill=False)
+    ax.add_patch(circle3_patch)
+
+    # Draw the line connecting circle1 center and four points on circle2
+    points_on_circle2 = sample_points(circle2)
+
+    for point in points_on_circle2:
+        line_x = [circle1.center.x, point.x]
+        line_y = [circle1.center.y, point.y]
+        ax.plot(line_x, line_y, linestyle='--', color='black', label=f'Line C1-{points_on_circle2.index(point) + 1}')
+
+    # Mark the four points on circle2
+    ax.scatter(*zip(*[(point.x, point.y) for point in points_on_circle2]), color='black', label='Points on C2')
+
+    ax.set_aspect('equal', adjustable='datalim')
+    #ax.legend()
+    plt.grid(True)
+    plt.show()
+
+
+def draw_flock(circles):
+    import matplotlib.pyplot as plt
+
+    _, ax = plt.subplots()
+
+    circle = circles[0]
+
+    circle_patch = plt.Circle((circle.center.x, circle.center.y), circle.radius, color="blue", fill=True)
+    ax.add_patch(circle_patch)
+
+    # Visibility of every circle from the first one, all others being obstacles
+    centers, radii = circle_arrays(circles)
+    visible = visibility_matrix(centers, radii)[0]
+
+    for j, other_circle in enumerate(circles[1:], start=1):
+        color = 'green' if visible[j] else 'red'
+        circle_patch = plt.Circle((other_circle.center.x, other_circle.center.y), other_circle.radius,
+                                  color=color, fill=True)
+        ax.add_patch(circle_patch)
+
+    ax.plot()
+
+    ax.set_aspect('equal', adjustable='datalim')
+    plt.grid(True)
+    plt.show()
+
+
+def main(num_of_units=10):
+    
+    circles = []
+    i = 0
+    while (i < num_of_units):
+        center = Point(np.random.randint(0, 150), np.random.randint(0, 100))
+        radius = np.random.randint(4, 8)
+        acceptable = True
+        for c in circles:
+            dist = distance(c.center, center)
+            if (dist < (c.radius + radius)):
+                acceptable = False
+                break
+        if acceptable:    
+            circles.append(Circle(center, radius))
+            i += 1
+
+    draw_flock(circles)
+
+if __name__ == '__main__':
+    main(10)
@@ -0,0 +1,105 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Merged intervals of the visual fields of a flock, one row per interval
+VisualField = namedtuple('VisualField', ['owner', 'start', 'end', 'occupied'])
+
+
+def wrap(angle):
+    # Angle mapped to [-pi, pi)
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+def intervals(observer, dx, dy, dist, heading, body_radius):
+    """
+    Angular intervals the neighbours occupy in the vision of their observers.
+
+    Parameters:
+    - observer (numpy.ndarray): Index of the observing bird of each pair.
+    - dx, dy, dist (numpy.ndarray): Vector and distance from the observer to the neighbour.
+    - heading (numpy.ndarray): Heading of every bird, angles are relative to it.
+    - body_radius (float): Radius of the neighbours' bodies.
+
+    Returns:
+    tuple: Arrays observer, start and end, with intervals crossing the back
+    of the observer (+-pi) split in two.
+    """
+    bearing = wrap(np.arctan2(dy, dx) - heading[observer])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        half = np.where(dist > body_radius, np.arcsin(np.minimum(body_radius / dist, 1)), np.pi)
+    start = bearing - half
+    end = bearing + half
+
+    # Pieces sticking out beyond -pi or pi continue on the other side
+    low = start < -np.pi
+    high = end > np.pi
+    observer = np.concatenate([observer, observer[low], observer[high]])
+    start, end = (np.concatenate([np.maximum(start, -np.pi), start[low] + 2 * np.pi, np.full(high.sum(), -np.pi)]),
+                  np.concatenate([np.minimum(end, np.pi), np.full(low.sum(), np.pi), end[high] - 2 * np.pi]))
+    return observer, start, end
+
+
+def merge(observer, start, end, n):
+    """
+    Merge overlapping intervals of each observer in a single sort and sweep.
+
+    Returns:
+    VisualField: Disjoint intervals sorted by observer and start, and the
+    fraction of each observer's 2 * pi visual field they occupy.
+    """
+    order = np.lexsort((start, observer))
+    observer, start, end = observer[order], start[order], end[order]
+
+    # Running maximum of the ends within each observer, offset so observers do not mix,
+    # only used to find where merged intervals begin
+    offset = observer * 4 * np.pi
+    reach = np.maximum.accumulate(end + offset)
+    first = np.ones(len(start), dtype=bool)
+    first[1:] = (observer[1:] != observer[:-1]) | (start[1:] + offset[1:] > reach[:-1])
+
+    # Each merged interval spans from its first start to the largest end before the next one
+    begin = np.flatnonzero(first)
+    finish = np.maximum.reduceat(end, begin) if len(begin) else end
+    merged = VisualField(observer[begin], start[begin], finish, None)
+    occupied = np.bincount(merged.owner, merged.end - merged.start, minlength=n) / (2 * np.pi)
+    return merged._replace(occupied=np.minimum(occupied, 1))
+
+
+def project(observer, dx, dy, dist, heading, body_radius, n):
+    """
+    Visual field of every bird from the vectors to its neighbours.
+
+    Returns:
+    VisualField: Occupied intervals of each bird's field, relative to its heading.
+    """
+    return merge(*intervals(observer, dx, dy, dist, heading, body_radius), n)
+
+
+def edges(field):
+    """
+    Angles of the visible edges, where the visual field switches between free and occupied.
+
+    Returns:
+    tuple: Arrays owner and angle. The back of the observer (+-pi) is not an edge.
+    """
+    owner = np.concatenate([field.owner, field.owner])
+    angle = np.concatenate([field.start, field.end])
+    real = np.abs(angle) < np.pi
+    return owner[real], angle[real]
+
+
+def field_forces(field, n):
+    """
+    Integrals of the vision-based model over the visual fields.
+
+    Returns:
+    tuple: Per bird, the integral of -V cos(phi) and -V sin(phi) over the
+    field, and the sums of cos(phi) and sin(phi) over its edges.
+    """
+    front = -np.bincount(field.owner, np.sin(field.end) - np.sin(field.start), minlength=n)
+    side = -np.bincount(field.owner, np.cos(field.start) - np.cos(field.end), minlength=n)
+    owner, angle = edges(field)
+    edge_cos = np.bincount(owner, np.cos(angle), minlength=n)
+    edge_sin = np.bincount(owner, np.sin(angle), minlength=n)
+    return front, side, edge_cos, edge_sin
@@ -1,273 +1,12 @@
-import pygame
-import math
-import random
+from collective.cli import simulate
+from collective.flock import HEIGHT
 
 # Constants
-WIDTH, HEIGHT = 900, 600
-BG_COLOR = (255, 255, 255)
-TAIL_COLOR = (255, 165, 0)
-BIRD_COLOR = (0, 0, 0)
 NUM_BIRDS = 50
-BL = 5  # Body length/diameter of each bird
-DELTA_T = 0.1  # Time step for updating positions
-
-ALPHA_0 = 0.2 # Acceleration coefficient for separation/cohesion
-BETA_0 = 0.001 # Angular velocity coefficient for alignment
-ALPHA_1 = 0.08 # Acceleration coefficient for adapting to spatial gradient velocity 
-BETA_1 = 0.08 # Angular velocity coefficient for adapting to the angular gradient 
-MAX_SPEED = 5
+SEED = None # An integer makes every run start the same
 MAX_TAIL_LENGTH = 15
+NUM_PREDATORS = 1
 
-
-class Bird:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.v = 2 # Initial velocity
-        self.angle = random.uniform(0, 2 * math.pi)
-        self.bl = BL
-        self.radius = HEIGHT / 6 # Radius of the bird's perception, predator has larger radius
-        self.speed = 2  # Initial speed
-        self.tail = []
-        self.predator = False
-
-
-    def update(self, birds):
-
-        if self.predator:
-
-            nearby_birds = [other for other in birds if other != self and self.distance_to(other) < 2 * self.radius]
-            
-            if not nearby_birds:
-                nearby_birds = [birds[0]]
-
-            avg_position = [sum(other.x for other in nearby_birds) / len(nearby_birds),
-                            sum(other.y for other in nearby_birds) / len(nearby_birds)]
-
-            # Compute the direction towards the centroid
-            angle_to_centroid = math.atan2(avg_position[1] - self.y, avg_position[0] - self.x)
-
-            # Adjust the direction and speed to move towards the centroid
-            dangle = BETA_1 * (angle_to_centroid - self.angle)
-            dspeed = ALPHA_1 * (MAX_SPEED + 3 - self.speed)
-
-            # Cap the speed to a maximum value to maintain control
-            self.speed = min(self.speed + dspeed * DELTA_T, MAX_SPEED + 3)
-            self.angle += dangle * DELTA_T * 4 # Predator turns faster
-            self.angle += self.normalize_angle(dangle * DELTA_T)
-
-            # Update position with the adjusted speed and angle
-            self.x += math.cos(self.angle) * self.speed
-            self.y += math.sin(self.angle) * self.speed
-
-            # Wrap-around the screen
-            self.x %= WIDTH
-            self.y %= HEIGHT
-
-            dynamic_tail_length = int(self.speed / MAX_SPEED * MAX_TAIL_LENGTH)
-            self.tail.insert(0, (self.x, self.y))
-
-            # Remove the last tail point if the tail is too long
-            if len(self.tail) > dynamic_tail_length:
-                self.tail.pop()
-
-            return
-
-        nearby_predator = None
-        for other in birds:
-            if other.predator and self != other and self.distance_to(other) < self.radius:
-                nearby_predator = other
-                break
-
-        if nearby_predator:
-            # Fly in the opposite direction of the predator
-            angle_to_predator = math.atan2(self.y - nearby_predator.y, self.x - nearby_predator.x)
-
-            dangle = angle_to_predator - self.angle
-            dspeed = MAX_SPEED
-
-            self.speed = min(self.speed + dspeed * DELTA_T, MAX_SPEED + 1)
-            self.angle += dangle * DELTA_T
-            self.angle += self.normalize_angle(dangle * DELTA_T)
-
-            self.x += math.cos(self.angle) * self.speed
-            self.y += math.sin(self.angle) * self.speed
-
-            self.x %= WIDTH
-            self.y %= HEIGHT
-
-            dynamic_tail_length = int(self.speed / MAX_SPEED * MAX_TAIL_LENGTH)
-            self.tail.insert(0, (self.x, self.y))
-
-            # Remove the last tail point if the tail is too long
-            if len(self.tail) > dynamic_tail_length:
-                self.tail.pop()
-
-
-            return
-
-        # Initialize the change in speed and heading
-        dspeed = 0
-        dangle = 0
-        
-        # Distance and angle differences to other birds
-        distances = [self.distance_to(other) for other in birds if other != self]
-        angle_diffs = [(math.atan2(other.y - self.y, other.x - self.x) - self.angle) % (2*math.pi) for other in birds if other != self]
-        
-        for dist, angle_diff in zip(distances, angle_diffs):
-            if angle_diff > math.pi:
-                angle_diff -= 2 * math.pi  # Wrap the angle to [-pi, pi]
-
-            # Separate from birds that are too close
-            if dist < self.radius * 2:
-                dspeed -= ALPHA_0 / dist
-                dangle -= BETA_0 * angle_diff / dist
-            
-            # Cohere towards birds that are at an ideal distance
-            elif dist < self.radius * 4:
-                dspeed += ALPHA_0 / dist
-                dangle += BETA_0 * angle_diff / dist
-        
-        # Compute spatial gradient based on the average speed.
-        avg_speed = sum(other.speed for other in birds if other != self) / (len(birds) - 1)
-        spatial_grad = avg_speed - self.speed
-        
-        # Compute angular gradient based on the average angle.
-        avg_angle = sum(angle_diffs) / len(angle_diffs) if angle_diffs else 0
-        angular_grad = avg_angle - self.angle
-        
-        # Apply the adaptive coefficients
-        dspeed += ALPHA_1 * spatial_grad
-        dangle += BETA_1 * angular_grad
-
-        # Cap the speed to a maximum value to maintain control
-        self.speed = min(self.speed + dspeed * DELTA_T, MAX_SPEED)
-        self.angle += dangle * DELTA_T
-        self.angle += self.normalize_angle(dangle * DELTA_T)
-        
-        # Update position with the adjusted speed and angle
-        self.x += math.cos(self.angle) * self.speed
-        self.y += math.sin(self.angle) * self.speed
-        
-        # Wrap-around the screen
-        self.x %= WIDTH
-        self.y %= HEIGHT
-
-        dynamic_tail_length = int(self.speed / MAX_SPEED * MAX_TAIL_LENGTH)
-        self.tail.insert(0, (self.x, self.y))
-
-        # Remove the last tail point if the tail is too long
-        if len(self.tail) > dynamic_tail_length:
-            self.tail.pop()
-
-    def draw_tail(self, screen):
-        # Draw the clipped tail with a thicker line and fading effect
-        if len(self.tail) > 1:
-            tail_segments = list(zip(self.tail[:-1], self.tail[1:]))
-            num_segments = min(len(tail_segments), MAX_TAIL_LENGTH)
-
-            for i in range(num_segments):
-                # Clip the tail segments at the screen boundaries
-                t = i / num_segments
-
-                start_point = (
-                    max(0, min(WIDTH - 1, int(tail_segments[i][0][0]))),
-                    max(0, min(HEIGHT - 1, int(tail_segments[i][0][1])))
-                )
-                end_point = (
-                    max(0, min(WIDTH - 1, int(tail_segments[i][1][0]))),
-                    max(0, min(HEIGHT - 1, int(tail_segments[i][1][1])))
-                )
-
-                if abs(start_point[0] - end_point[0]) > WIDTH / 2:
-                    if start_point[0] < end_point[0]:
-                        end_point = (end_point[0] - WIDTH, end_point[1])
-                    else:
-                        end_point = (end_point[0] + WIDTH, end_point[1])
-
-                # Check for vertical screen wrapping and adjust the drawing
-                if abs(start_point[1] - end_point[1]) > HEIGHT / 2:
-                    if start_point[1] < end_point[1]:
-                        end_point = (end_point[0], end_point[1] - HEIGHT)
-                    else:
-                        end_point = (end_point[0], end_point[1] + HEIGHT)
-                        
-                gradient_color = (
-                    int((1 - t) * (200 - 255) + TAIL_COLOR[0]),
-                    int((1 - t) * (200 - 165) + TAIL_COLOR[1]),
-                    int((1 - t) * (200 - 0) + TAIL_COLOR[2]),
-                )
-                thickness = int(5 * (1 - t))
-
-                # Draw a line with the calculated thickness
-                pygame.draw.line(screen, gradient_color, start_point, end_point, thickness)
-                
-    def distance_to(self, other):
-        dx = other.x - self.x
-        dy = other.y - self.y
-        return math.sqrt(dx * dx + dy * dy)
-    
-    @staticmethod
-    def normalize_angle(angle):
-        # Normalize angle to be between -pi and pi
-        while angle <= -math.pi:
-            angle += 2 * math.pi
-        while angle > math.pi:
-            angle -= 2 * math.pi
-        return angle
-    
-    def move(self):
-        self.x += self.v * math.cos(self.angle) * DELTA_T
-        self.y += self.v * math.sin(self.angle) * DELTA_T
-        self.x %= WIDTH
-        self.y %= HEIGHT
-
-    def draw(self, screen):
-        # Draw bird as a circle with radius = BL / 2
-        bird_color = BIRD_COLOR
-        if self.predator:
-            bird_color = (255, 0, 0)  # Draw predator in red
-
-        pygame.draw.circle(screen, bird_color, (int(self.x), int(self.y)), self.bl // 2)
-
-# Set up the Pygame screen
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Flocking Simulation")
-
-margin = 125
-# Create a set of birds
-center_x, center_y = WIDTH // 2, HEIGHT // 2
-birds = []
-for _ in range(NUM_BIRDS):
-    while True:
-        new_x = center_x + random.uniform(-margin, margin)
-        new_y = center_y + random.uniform(-margin, margin)
-        
-        # Check if the new position is not already taken
-        if (new_x, new_y) not in [(b.x, b.y) for b in birds]:
-            break
-
-    birds.append(Bird(new_x, new_y))
-birds[-1].predator = True
-
-running = True
-clock = pygame.time.Clock()
-
-# Main loop
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-    
-    screen.fill(BG_COLOR)
-
-    # Update and draw all birds
-    for bird in birds:
-        bird.update(birds)
-        bird.draw_tail(screen)  # Draw the bird tail
-        bird.draw(screen)
-
-    pygame.display.flip()
-    clock.tick(30)
-
-pygame.quit()
\ No newline at end of file
+if __name__ == '__main__':
+    # The last birds are the predators, press P to show the time spent per phase of a frame
+    simulate(NUM_BIRDS, SEED, MAX_TAIL_LENGTH, radius=HEIGHT / 6, predators=NUM_PREDATORS, margin=125, fps=30)
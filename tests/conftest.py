@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+import pytest
+
+from collective.flock import Flock, HEIGHT, WIDTH
+
+GRID = {'neighbors': 'grid', 'radius': 10} # Perception range 40, about 16 birds in range at AREA_PER_BIRD
+AREA_PER_BIRD = 1000 # World area per bird of the grid flocks
+
+# Name: Flock arguments of every mode the tests step
+MODES = {
+    'all': {},
+    'sequential': {'sequential': True},
+    'grid': GRID,
+    'vision': {**GRID, 'interaction': 'vision'},
+    'occlusion': {**GRID, 'occlusion': True},
+    'barnes_hut': {'theta': 0.5},
+    'compact': {**GRID, 'dtype': 'float32', 'tails': 'uint16'},
+    'no_tails': {**GRID, 'dtype': 'float32', 'tails': None},
+}
+
+
+def make_flock(n, mode='all', seed=0, predators=0.02):
+    """
+    Flock of n birds in one of MODES with reproducible positions and headings.
+
+    Grid flocks are spread over a world growing with n, so the number of
+    neighbours per bird stays the same at every size; the others start in
+    the box around the centre like the simulation scripts. The last share
+    of the birds are predators, at least one.
+    """
+    options = MODES[mode]
+    rng = np.random.default_rng(seed)
+    if options.get('neighbors') == 'grid':
+        width = int(math.sqrt(n * AREA_PER_BIRD * 1.5))
+        height = int(width / 1.5)
+        x, y = rng.uniform(0, width, n), rng.uniform(0, height, n)
+    else:
+        width, height = WIDTH, HEIGHT
+        x, y = WIDTH / 2 + rng.uniform(-125, 125, n), HEIGHT / 2 + rng.uniform(-125, 125, n)
+    flock = Flock(x, y, rng.uniform(0, 2 * np.pi, n), width=width, height=height, **options)
+    if predators:
+        flock.predator[-max(1, int(n * predators)):] = True
+    return flock
+
+
+@pytest.fixture(params=list(MODES))
+def mode(request):
+    return request.param
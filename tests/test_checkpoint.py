@@ -0,0 +1,31 @@
+import random
+
+import numpy as np
+
+from collective.checkpoint import load, save
+
+from .conftest import MODES, make_flock
+
+
+def test_resumed_run_equals_uninterrupted_run(mode, tmp_path):
+    flock = make_flock(500 if MODES[mode].get('neighbors') == 'grid' else 150, mode, seed=5)
+    # Long enough for the tails to grow, wrap around their ring buffers and differ in length
+    for _ in range(60):
+        flock.step()
+    path = str(tmp_path / 'run.ckp')
+    random.seed(11)
+    save(path, flock, step=60)
+    expected_random = random.random()
+    for _ in range(20):
+        flock.step()
+
+    random.seed(0)
+    resumed, step, _ = load(path)
+    assert step == 60
+    assert random.random() == expected_random
+    for _ in range(20):
+        resumed.step()
+    assert np.array_equal(resumed.buffers[resumed.front], flock.buffers[flock.front])
+    assert np.array_equal(resumed.predator, flock.predator)
+    assert np.array_equal(resumed.tail_length, flock.tail_length)
+    assert np.array_equal(resumed.ordered_tails()[0], flock.ordered_tails()[0])
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from collective.metrics import Metrics
+from collective.parallel import ParallelFlock
+
+from .conftest import make_flock
+
+
+def test_parallel_step_equals_flock_step(mode):
+    if mode == 'sequential':
+        pytest.skip("Sequential updates cannot be partitioned")
+    # The all-pairs partitions are larger than BLOCK_SIZE, the others more than the workers
+    n, partitions = (2500, 2) if mode == 'all' else (1000, 3)
+    serial, parallel = make_flock(n, mode, seed=3), make_flock(n, mode, seed=3)
+    for flock in (serial, parallel):
+        flock.attach(Metrics())
+    with ParallelFlock(parallel, workers=2, partitions=partitions) as stepper:
+        for _ in range(3):
+            stepper.step()
+            serial.step()
+    assert np.array_equal(parallel.buffers, serial.buffers)
+    assert np.array_equal(parallel.neighbor_stats, serial.neighbor_stats)
+    assert np.array_equal(parallel.tail_points, serial.tail_points)
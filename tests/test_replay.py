@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+import pygame
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from collective import replay # noqa: E402
+from collective.render import Viewer # noqa: E402
+from collective.trajectory import Recorder, Trajectory # noqa: E402
+
+from .conftest import make_flock # noqa: E402
+
+
+def test_replay_starts_at_the_start_frame(tmp_path, monkeypatch):
+    path = str(tmp_path / 'run.traj')
+    flock = make_flock(50, seed=7)
+    with Recorder(path, flock) as recorder:
+        for step in range(20):
+            recorder(step, flock)
+            flock.step()
+
+    # Close the window at once and keep the state of the first drawn frame
+    drawn = []
+
+    def draw(viewer):
+        drawn.append((viewer.scene.flock.x.copy(), viewer.scene.flock.y.copy()))
+
+    monkeypatch.setattr(pygame.event, 'get', lambda: [pygame.event.Event(pygame.QUIT)])
+    monkeypatch.setattr(Viewer, 'draw', draw)
+    replay.main([path, '--start', '12'])
+
+    trajectory = Trajectory(path)
+    assert not np.array_equal(trajectory.frames[12]['x'], trajectory.frames[0]['x'])
+    assert np.array_equal(drawn[0][0], trajectory.frames[12]['x'])
+    assert np.array_equal(drawn[0][1], trajectory.frames[12]['y'])
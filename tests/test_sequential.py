@@ -0,0 +1,54 @@
+import math
+import random
+
+import numpy as np
+
+from collective.flock import Flock, place_birds, ALPHA_0, ALPHA_1, BETA_0, BETA_1, DELTA_T, HEIGHT, MAX_SPEED, WIDTH
+
+RADIUS = 1000
+
+
+def baseline_step(birds):
+    # Bird.update of the original simulation.py on dicts, every bird in place in list order
+    for bird in birds:
+        others = [other for other in birds if other is not bird]
+        distances = [math.sqrt((o['x'] - bird['x']) ** 2 + (o['y'] - bird['y']) ** 2) for o in others]
+        angle_diffs = [(math.atan2(o['y'] - bird['y'], o['x'] - bird['x']) - bird['angle']) % (2 * math.pi)
+                       for o in others]
+        dspeed = dangle = 0
+        for dist, angle_diff in zip(distances, angle_diffs):
+            if angle_diff > math.pi:
+                angle_diff -= 2 * math.pi
+            if dist < RADIUS * 2:
+                dspeed -= ALPHA_0 / dist
+                dangle -= BETA_0 * angle_diff / dist
+            elif dist < RADIUS * 4:
+                dspeed += ALPHA_0 / dist
+                dangle += BETA_0 * angle_diff / dist
+        dspeed += ALPHA_1 * (sum(o['speed'] for o in others) / len(others) - bird['speed'])
+        dangle += BETA_1 * (sum(angle_diffs) / len(angle_diffs) - bird['angle'])
+
+        bird['speed'] = min(bird['speed'] + dspeed * DELTA_T, MAX_SPEED)
+        bird['angle'] += dangle * DELTA_T
+        turn = dangle * DELTA_T
+        while turn <= -math.pi:
+            turn += 2 * math.pi
+        while turn > math.pi:
+            turn -= 2 * math.pi
+        bird['angle'] += turn
+        bird['x'] = (bird['x'] + math.cos(bird['angle']) * bird['speed']) % WIDTH
+        bird['y'] = (bird['y'] + math.sin(bird['angle']) * bird['speed']) % HEIGHT
+
+
+def test_sequential_matches_the_original_loop():
+    random.seed(4)
+    xs, ys = place_birds(30)
+    angles = [random.uniform(0, 2 * math.pi) for _ in xs]
+    birds = [{'x': x, 'y': y, 'angle': a, 'speed': 2.0} for x, y, a in zip(xs, ys, angles)]
+    flock = Flock(xs, ys, angles, radius=RADIUS, sequential=True)
+    for _ in range(50):
+        baseline_step(birds)
+        flock.step()
+    expected = np.array([[bird[name] for bird in birds] for name in ('x', 'y', 'angle', 'speed')])
+    # The vectorized sums add up in another order than the loop, equal up to rounding (about 1e-13 here)
+    np.testing.assert_allclose(flock.state, expected, rtol=0, atol=1e-11)